@@ -0,0 +1,263 @@
+# LEVEL-OF-DETAIL AGGREGATION
+
+from collections import Counter, defaultdict
+from typing import Optional
+
+import numpy as np
+
+from graph import ProjectGraph
+
+# detail levels, from most to least detailed; "auto" picks the most detailed one
+# that stays under AUTO_THRESHOLD elements
+DETAIL_LEVELS = ("full", "objective", "loe")
+# views with more elements than this are aggregated automatically
+AUTO_THRESHOLD = 1500
+# statuses from worst to best; a group is shown with the worst status of its members
+STATUS_ORDER = ["overdue", "at risk", "on track", "complete"]
+
+
+def group_id(graph: ProjectGraph, node_id: str, level: str) -> Optional[str]:
+    """Get the group a node is collapsed into at a detail level.
+
+    At the "loe" level every LOE is collapsed together with all of its nodes. At the
+    "objective" level every objective is collapsed together with its intermediate
+    objectives, which are found from the IDs (IO1.2.3 belongs to O1.2).
+
+    Args:
+        graph (ProjectGraph): The graph the node belongs to.
+        node_id (str): The ID of the node.
+        level (str): "loe" or "objective".
+
+    Returns:
+        Optional[str]: The ID of the node the group is named after (an LOE or an
+            objective), or None if the node is not in a group.
+    """
+    if level == "loe":
+        if node_id in graph.children:
+            return node_id
+        parent = graph.parent(node_id)
+        return parent if parent in graph.index else None
+    if node_id.startswith("IO"):
+        objective = "O" + node_id[2:].rsplit(".", 1)[0]
+        return objective if objective in graph.index else None
+    if node_id.startswith("O"):
+        return node_id
+    return None
+
+
+class Aggregation:
+    """Summary nodes for one detail level of a graph.
+
+    The summary node of every group (see group_id) is built once, with the number
+    of members per status, along with the position of the summary node every
+    element of the graph is shown as. Collapsing a view then works on the positions
+    of its elements: members are swapped for their group's summary node and the
+    edges between groups are merged, and only the elements of the collapsed view
+    are built as dicts. Summary nodes reuse the ID and the parent of the node the
+    group is named after, and have the class "aggregate".
+
+    Args:
+        graph (ProjectGraph): The graph to aggregate. Its layout is used to place
+            the summary nodes.
+        level (str): "loe" or "objective".
+    """
+
+    def __init__(self, graph: ProjectGraph, level: str):
+        self.graph = graph
+        self.level = level
+        positions = graph.layout()
+        # node id -> id of its group
+        self.group = {}
+        members = defaultdict(list)
+        for node_id in graph.index:
+            group = group_id(graph, node_id, level)
+            if group is not None:
+                self.group[node_id] = group
+                members[group].append(node_id)
+
+        # group id -> summary node, for groups with members besides the group node
+        self.nodes = {}
+        for group, ids in members.items():
+            others = [node_id for node_id in ids if node_id != group]
+            if not others:
+                continue
+            counts = Counter(
+                graph.value(graph.index[node_id], "status") for node_id in others
+            )
+            counts.pop(None, None)
+            placed = [positions[node_id] for node_id in ids if node_id in positions]
+            element = graph.node(group)
+            self.nodes[group] = {
+                "data": {
+                    **element["data"],
+                    "label": f"{group} (+{len(others)})",
+                    "description": f"{element['data']['description']} "
+                    f"({summarize(counts)})",
+                    "status": worst_status(
+                        [element["data"].get("status"), *counts.elements()]
+                    ),
+                    "status_counts": dict(counts),
+                    "aggregate": True,
+                },
+                "position": {
+                    "x": sum(position["x"] for position in placed) / len(placed),
+                    "y": sum(position["y"] for position in placed) / len(placed),
+                },
+                "classes": f"{element['classes']} aggregate",
+            }
+            if level == "objective":
+                # the objective stays where it is, its IOs gather into it
+                self.nodes[group]["position"] = element["position"]
+
+        # position of the summary node every element is collapsed into; -1 for
+        # edges and for nodes outside the groups that have a summary node
+        self._groups = np.full(len(graph), -1, dtype=np.int64)
+        for node_id, group in self.group.items():
+            if group in self.nodes:
+                self._groups[graph.index[node_id]] = graph.index[group]
+        self._edges = np.array(
+            [source is not None for source in graph.store.column("source")], dtype=bool
+        )
+
+    def collapse(self, positions, expanded=()) -> list[dict]:
+        """Replace the members of every group in a view with the group's summary.
+
+        Edges inside a group are dropped, and edges between the same two summary
+        nodes (or a summary node and a node) are merged into one edge whose "count"
+        is the number of edges merged.
+
+        Args:
+            positions (np.ndarray): The positions of the view's elements in the
+                graph, e.g. from ProjectGraph.loe_positions.
+            expanded (Iterable[str]): IDs of groups to show in full.
+
+        Returns:
+            list[dict]: The elements of the collapsed view, nodes before edges.
+        """
+        return self._build(*self._collapse(positions, expanded))
+
+    def _collapse(self, positions, expanded) -> tuple:
+        """Find the elements of a collapsed view, without building them.
+
+        Returns:
+            tuple: The positions of the nodes shown and whether each is a summary
+                node, the positions of the edges kept as they are, and the merged
+                edges as a Counter of (source, target, classes).
+        """
+        graph = self.graph
+        positions = np.asarray(positions, dtype=np.int64)
+        groups = self._groups
+        expanded = [graph.index[group] for group in expanded if group in self.nodes]
+        if expanded:
+            groups = np.where(np.isin(groups, expanded), -1, groups)
+
+        def shown_as(ends):
+            group = np.where(ends >= 0, groups[ends], -1)
+            return np.where(group >= 0, group, ends)
+
+        is_edge = self._edges[positions]
+        nodes = shown_as(positions[~is_edge])
+        # every node or summary node once, in the order it first appears
+        _, first = np.unique(nodes, return_index=True)
+        nodes = nodes[np.sort(first)]
+
+        edges = positions[is_edge]
+        sources, targets = graph.sources[edges], graph.targets[edges]
+        shown_sources, shown_targets = shown_as(sources), shown_as(targets)
+        kept = (shown_sources == sources) & (shown_targets == targets)
+        merge = ~kept & (shown_sources != shown_targets)
+        ids = graph.store.column("id")
+        source_ids = graph.store.column("source")
+        target_ids = graph.store.column("target")
+        classes = graph.store.classes
+        merged = Counter(
+            (
+                ids[source] if source >= 0 else source_ids[i],
+                ids[target] if target >= 0 else target_ids[i],
+                classes[i],
+            )
+            for i, source, target in zip(
+                edges[merge].tolist(),
+                shown_sources[merge].tolist(),
+                shown_targets[merge].tolist(),
+            )
+        )
+        return nodes, groups[nodes] >= 0, edges[kept], merged
+
+    def _build(self, nodes, summaries, kept, merged) -> list[dict]:
+        """Build the elements of a view found by _collapse."""
+        store = self.graph.store
+        ids = store.column("id")
+        built = iter(store.elements(nodes[~summaries]))
+        elements = [
+            self.nodes[ids[i]] if summary else next(built)
+            for i, summary in zip(nodes.tolist(), summaries.tolist())
+        ]
+        elements += store.elements(kept)
+        elements += [
+            {
+                "data": {
+                    "id": f"{source}->{target}:{classes}",
+                    "source": source,
+                    "target": target,
+                    "count": count,
+                    "label": str(count),
+                },
+                "classes": f"{classes} aggregate",
+            }
+            for (source, target, classes), count in merged.items()
+        ]
+        return elements
+
+
+def worst_status(statuses) -> Optional[str]:
+    """Get the worst of some statuses, ignoring unknown ones."""
+    ranks = [
+        STATUS_ORDER.index(status) for status in statuses if status in STATUS_ORDER
+    ]
+    return STATUS_ORDER[min(ranks)] if ranks else None
+
+
+def summarize(counts: Counter) -> str:
+    """Describe status counts, worst first, e.g. "2 overdue, 5 on track"."""
+    return ", ".join(
+        f"{counts[status]} {status}" for status in STATUS_ORDER if counts[status]
+    )
+
+
+def detail_view(
+    graph: ProjectGraph,
+    positions,
+    aggregations: dict,
+    detail: str = "auto",
+    expanded=(),
+) -> list[dict]:
+    """Get a view at a detail level.
+
+    Only the elements of the view returned are built as dicts; with "auto", the
+    size of each level is found from the positions alone.
+
+    Args:
+        graph (ProjectGraph): The graph the view is taken from.
+        positions (np.ndarray): The positions of the view's elements in full
+            detail, e.g. from ProjectGraph.loe_positions.
+        aggregations (dict[str, Aggregation]): The aggregation of each level
+            other than "full".
+        detail (str): One of DETAIL_LEVELS, or "auto" for the most detailed level
+            that has at most AUTO_THRESHOLD elements (or the least detailed level).
+        expanded (Iterable[str]): IDs of groups to show in full.
+
+    Returns:
+        list[dict]: The elements of the view, nodes before edges.
+    """
+    if detail == "full" or detail == "auto" and len(positions) <= AUTO_THRESHOLD:
+        return graph.store.elements(positions)
+    if detail != "auto":
+        return aggregations[detail].collapse(positions, expanded)
+    for level in DETAIL_LEVELS[1:]:
+        aggregation = aggregations[level]
+        view = aggregation._collapse(positions, expanded)
+        nodes, _, kept, merged = view
+        if len(nodes) + len(kept) + len(merged) <= AUTO_THRESHOLD:
+            break
+    return aggregation._build(*view)
@@ -1,210 +1,272 @@
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, ctx, no_update
+from dash.exceptions import PreventUpdate
 import dash_cytoscape as cyto
 import json
-import plotly.express as px
-import pandas as pd
+import os
 
+import metrics
+from aggregate import detail_view
 from styling import stylesheet
-from elements import (
-    all_elements,
-    nodes,
-    nodes_list,
-    edges,
-    loes,
-    loes_list,
-    project_data,
-)
+from projects import DEFAULT_PROJECT, ProjectRegistry
 
 
 # APP CAPABILITIES:
 # 1. DISPLAY LOE NETWORK
 # 2. CLICK TO DISPLAY NODE OBJECTIVE DETAILS
 # 3. SELECTIVELY VIEW LOES
-# 4. DISPLAY LOES IN A TIMELINE VIEW WHICH ALSO DISPLAYS DEPENDENCIES
+# 4. DISPLAY LOES IN A TIMELINE VIEW WHICH ALSO DISPLAYS DEPENDENCIES AND THE CRITICAL PATH
+# 5. RELOAD THE PROJECT DATA WHEN THE WORKBOOK CHANGES
+# 6. COLLAPSE LOES OR OBJECTIVES INTO SUMMARY NODES FOR LARGE PROJECTS
+# 7. SHOW ANY PROJECT WORKBOOK IN THE FOLDER, SELECTED BY URL (e.g. /project_state)
 
-app = Dash(__name__)
-cyto.load_extra_layouts()
+# page content depends on the URL, so callbacks refer to components added later
+app = Dash(__name__, suppress_callback_exceptions=True)
+# opt-in callback timings at /metrics, see metrics.py
+metrics.register(app.server)
 
+# projects are the workbooks in this folder (or LOEVIZ_PROJECTS_DIR), each loaded the
+# first time it is visited and watched for changes from then on
+# when run by serve.py, workers instead follow the snapshots its loader publishes
+registry = ProjectRegistry(
+    os.environ.get("LOEVIZ_PROJECTS_DIR", "."),
+    max_loaded=int(os.environ.get("LOEVIZ_MAX_PROJECTS", "8")),
+    snapshot_dir=os.environ.get("LOEVIZ_SNAPSHOT_DIR") or None,
+    update_cells=os.environ.get("LOEVIZ_UPDATE_CELLS") == "1",
+)
+# WSGI entry point for production servers, e.g. gunicorn app:server
+server = app.server
 
-# CREATE MORE COMPLEX APP COMPONENTS
 
-# LOE checklist to select which LOEs to display
-loe_checklist = dcc.Checklist(id="loe_checklist", options=loes_list, value=loes_list)
+# LAYOUT DETERMINES ORGANIZATION OF COMPONENTS ON THE APP
 
-# cytoscape is the network/graph structure for dash
-cytoscape = cyto.Cytoscape(
-    id="cytoscape",
-    layout={"name": "dagre", "rankDir": "TB"},
-    style={"width": "100%", "height": "650px"},
-    elements=all_elements,
-    stylesheet=stylesheet,
-)
-
-# figure for the timeline view
-fig = px.timeline(
-    data_frame=project_data,
-    x_start="Start Date",
-    x_end="End Date",
-    y="ID",
-    color="Status",
-    color_discrete_map={
-        "Overdue": "red",
-        "At Risk": "yellow",
-        "On Track": "green",
-        "Complete": "blue",
-    },
-    hover_data="Description",
-    height=500,
-)
-fig.add_shape(
-    type="line",
-    x0=pd.Timestamp.now(),
-    y0=-0.5,
-    x1=pd.Timestamp.now(),
-    y1=len(project_data) + 0.5,
-    line=dict(color="black", dash="dashdot", width=3),
-)
-fig.add_annotation(
-    x=pd.Timestamp.now(), y=len(project_data) + 1, text="Today", showarrow=False
-)
-fig.update_yaxes(autorange="reversed")
-for index, row in project_data.iterrows():
-    dependency_list = row["Dependencies"]
-    if isinstance(dependency_list, str):
-        dependencies = dependency_list.split(",")
-    else:
-        continue
-    for dep in dependencies:
-        dep_ind = project_data.index[project_data["ID"] == dep].to_list()[0]
-        dep_row = project_data.loc[dep_ind]
-        fig.add_annotation(
-            ax=dep_row["End Date"],
-            ay=dep_row["ID"],
-            x=max(row["Start Date"], dep_row["End Date"]),
-            y=row["ID"],
-            xref="x",
-            yref="y",
-            axref="x",
-            ayref="y",
-            showarrow=True,
-            text="",
-            arrowhead=3,
-            arrowwidth=1.5,
-            arrowcolor="black",
-        )
-fig.update_layout(
-   margin=dict(l=0, r=0, t=100, b=0)
-)
 
+# the page shows the project named in the URL, see displayProject
+app.layout = html.Div([dcc.Location(id="url"), html.Div(id="page")])
 
-# LAYOUT DETERMINES ORGANIZATION OF COMPONENTS ON THE APP
 
-network_view_layout = [
-    # menu block for filters, checklist, etc.
-    html.Div(id="menu-block", children=[loe_checklist, html.Hr()]),
-    # cytoscape block
-    html.Div(id="cytoscape-block", children=[cytoscape]),
-]
-
-app.layout = html.Div(
-    id="app-container",
-    children=[
-        # content
-        html.Div(
-            [
-                dcc.Tabs(
-                    [
-                        dcc.Tab(
-                            label="Network View",
-                            value="network",
-                            className="tab",
-                            children=network_view_layout,
-                        ),
-                        dcc.Tab(
-                            label="Timeline View",
-                            value="timeline",
-                            className="tab",
-                            children=dcc.Graph(figure=fig),
-                        ),
-                    ],
-                    id="tabs",
-                    value="network",
-                )
-            ],
-            id="content",
+# links to every project, shown with each project and when no project is found
+def project_links():
+    return [
+        html.H3("Projects"),
+        html.Ul(
+            [html.Li(dcc.Link(name, href=f"/{name}")) for name in registry.names()]
         ),
-        # info block
+    ]
+
+
+# page of one project, built with its latest data
+def project_layout(project, snapshot):
+    # CREATE MORE COMPLEX APP COMPONENTS
+
+    # LOE checklist to select which LOEs to display
+    loe_checklist = dcc.Checklist(
+        id="loe_checklist", options=snapshot.loes_list, value=snapshot.loes_list
+    )
+
+    # cytoscape is the network/graph structure for dash
+    cytoscape = cyto.Cytoscape(
+        id="cytoscape",
+        # positions are computed on the server (see ProjectGraph.layout)
+        layout={"name": "preset"},
+        style={"width": "100%", "height": "650px"},
+        # filled in by loe_filter, which runs as soon as the page is shown
+        elements=[],
+        stylesheet=stylesheet,
+    )
+
+    # level of detail; large views are collapsed automatically
+    detail_radio = dcc.RadioItems(
+        id="detail-radio",
+        options=[
+            {"label": "automatic detail", "value": "auto"},
+            {"label": "all nodes", "value": "full"},
+            {"label": "collapse objectives", "value": "objective"},
+            {"label": "collapse LOEs", "value": "loe"},
+        ],
+        value="auto",
+        inline=True,
+    )
+
+    network_view_layout = [
+        # menu block for filters, checklist, etc.
         html.Div(
-            id="info-block",
-            children=[
-                html.H3("Info"),
-                html.P(id="info-panel"),
-            ],
+            id="menu-block",
+            children=[loe_checklist, detail_radio, html.Hr()],
         ),
-    ],
-)
+        # cytoscape block
+        html.Div(id="cytoscape-block", children=[cytoscape]),
+    ]
+
+    return html.Div(
+        id="app-container",
+        children=[
+            # content
+            html.Div(
+                [
+                    dcc.Tabs(
+                        [
+                            dcc.Tab(
+                                label="Network View",
+                                value="network",
+                                className="tab",
+                                children=network_view_layout,
+                            ),
+                            dcc.Tab(
+                                label="Timeline View",
+                                value="timeline",
+                                className="tab",
+                                # built when the tab is first opened, see showTimeline
+                                children=dcc.Graph(id="timeline"),
+                            ),
+                        ],
+                        id="tabs",
+                        value="network",
+                    )
+                ],
+                id="content",
+            ),
+            # info block
+            html.Div(
+                id="info-block",
+                children=[
+                    html.H3("Info"),
+                    html.P(id="info-panel"),
+                    *project_links(),
+                ],
+            ),
+            # the project shown, and the version of its data, polled to pick up
+            # reloads in open pages
+            dcc.Store(id="project", data=project),
+            dcc.Store(id="snapshot-version", data=snapshot.version),
+            dcc.Interval(id="reload-interval", interval=5000),
+            # summary nodes the user expanded by clicking them
+            dcc.Store(id="expanded-groups", data=[]),
+            # the version of the data the timeline shows, if it was built yet
+            dcc.Store(id="timeline-version"),
+        ],
+    )
 
 
 # CALLBACKS MAKE APP INTERACTIVE
 
 
+# get the current snapshot of an open page's project; callbacks the user triggers
+# load the project again if it was unloaded to make room for others, while the
+# callbacks polling for reloads pass load=False so idle pages never load one
+def project_snapshot(project, load=True):
+    watcher = registry.get(project) if load else registry.loaded(project)
+    if watcher is None:
+        raise PreventUpdate
+    return watcher.snapshot
+
+
+# show the project named in the URL; the root shows the default project
+@app.callback(Output("page", "children"), Input("url", "pathname"))
+@metrics.instrument
+def displayProject(pathname):
+    project = (pathname or "/").strip("/") or DEFAULT_PROJECT
+    watcher = registry.get(project)
+    if watcher is None:
+        return html.Div(
+            [html.H3(f'No project "{project}" could be loaded'), *project_links()]
+        )
+    return project_layout(project, watcher.snapshot)
+
+
+# pick up a reloaded workbook in pages that are already open
+@app.callback(
+    Output("snapshot-version", "data"),
+    Input("reload-interval", "n_intervals"),
+    State("snapshot-version", "data"),
+    State("project", "data"),
+)
+@metrics.instrument
+def checkForReload(n_intervals, version, project):
+    current = project_snapshot(project, load=False).version
+    return current if current != version else no_update
+
+
+# refresh LOE options after a reload, keeping the user's selection
+@app.callback(
+    Output("loe_checklist", "options"),
+    Output("loe_checklist", "value"),
+    Input("snapshot-version", "data"),
+    State("loe_checklist", "options"),
+    State("loe_checklist", "value"),
+    State("project", "data"),
+    prevent_initial_call=True,
+)
+@metrics.instrument
+def refreshSnapshot(version, options, value, project):
+    snapshot = project_snapshot(project, load=False)
+    # keep selected LOEs that still exist, and show LOEs that are new
+    value = [loe_id for loe_id in snapshot.loes_list if loe_id in value] + [
+        loe_id for loe_id in snapshot.loes_list if loe_id not in options
+    ]
+    return snapshot.loes_list, value
+
+
+# build the timeline when its tab is opened, and again after a reload while it is
+# open; the figure is built once per snapshot and only sent if it is not shown yet
+@app.callback(
+    Output("timeline", "figure"),
+    Output("timeline-version", "data"),
+    Input("tabs", "value"),
+    Input("snapshot-version", "data"),
+    State("timeline-version", "data"),
+    State("project", "data"),
+)
+@metrics.instrument
+def showTimeline(tab, version, shown_version, project):
+    if tab != "timeline":
+        raise PreventUpdate
+    snapshot = project_snapshot(project)
+    if snapshot.version == shown_version:
+        raise PreventUpdate
+    return snapshot.timeline(), snapshot.version
+
+
 # LOE checklist displays nodes in selected LOE, along with dependencies in other LOEs
-@app.callback(Output("cytoscape", "elements"), Input("loe_checklist", "value"))
-def loe_filter(loe_checklist: list[str]):
-    selected_nodes = []
-    selected_edges = []
-
-    # loop through all selected loes
-    for loe_id in loe_checklist:
-        # add loe node
-        for loe in loes:
-            if loe["data"]["id"] == loe_id:
-                selected_nodes.append(loe)
-
-        # loop through all nodes (global)
-        for node in nodes:
-            # loop through nodes with parent as LOEx
-            if node["data"]["parent"] == loe_id:
-                # add node to selected elements list
-                selected_nodes.append(node)
-                node_id = node["data"]["id"]
-                # loop through all edges to find which contain LOEx nodes
-                for edge in edges:
-                    # find edge containing node
-                    if node_id in edge["data"].values():
-                        # if not already added
-                        if edge not in selected_edges:
-                            # add edge to selected elements list
-                            selected_edges.append(edge)
-
-                            # add nodes outside of LOE that are connected to nodes inside LOE
-                            # get id of other node on the edge
-                            edge_nodes = list(edge["data"].values())
-                            edge_nodes.remove(node_id)
-                            addl_node_id = edge_nodes[0]
-                            # use id to get node object
-                            addl_node = [
-                                node
-                                for node in nodes
-                                if node["data"]["id"] == addl_node_id
-                            ]
-                            # add loe parent node (allows app to draw edge if node is outside selected LOE)
-                            loe_node = [
-                                loe
-                                for loe in loes
-                                if loe["data"]["id"] == addl_node[0]["data"]["parent"]
-                            ]
-                            # add to selected_nodes
-                            selected_nodes = selected_nodes + addl_node + loe_node
-
-    # remove duplicate nodes
-    unique_nodes = []
-    for node in selected_nodes:
-        if node not in unique_nodes:
-            unique_nodes.append(node)
-
-    # return selected elements
-    return unique_nodes + selected_edges
+@app.callback(
+    Output("cytoscape", "elements"),
+    Input("loe_checklist", "value"),
+    Input("snapshot-version", "data"),
+    Input("detail-radio", "value"),
+    Input("expanded-groups", "data"),
+    State("project", "data"),
+)
+@metrics.instrument
+def loe_filter(
+    loe_checklist: list[str],
+    version: int = None,
+    detail="auto",
+    expanded=None,
+    project=DEFAULT_PROJECT,
+):
+    snapshot = project_snapshot(project)
+    # selected loes, their nodes, and dependencies in other LOEs (with parent loes)
+    positions = snapshot.graph.loe_positions(loe_checklist)
+    # collapsed into summary nodes if requested, or if there are too many elements
+    return detail_view(
+        snapshot.graph, positions, snapshot.aggregations, detail, expanded or []
+    )
+
+
+# click a summary node to expand it; changing the level of detail collapses all
+@app.callback(
+    Output("expanded-groups", "data"),
+    Input("cytoscape", "tapNodeData"),
+    Input("detail-radio", "value"),
+    State("expanded-groups", "data"),
+    prevent_initial_call=True,
+)
+@metrics.instrument
+def expandGroup(data, detail, expanded):
+    if ctx.triggered_id == "detail-radio":
+        return []
+    if not data or not data.get("aggregate") or data["id"] in expanded:
+        return no_update
+    return expanded + [data["id"]]
 
 
 # display node info when clicked
@@ -213,6 +275,7 @@ def loe_filter(loe_checklist: list[str]):
     Input("cytoscape", "tapNodeData"),
     prevent_initial_call=True,
 )
+@metrics.instrument
 def displayTapNodeData(data):
     if data is None:
         return
@@ -222,7 +285,7 @@ def displayTapNodeData(data):
         html.H4("Description"),
         html.P(data["description"]),
     ]
-    if not data["id"].startswith("LOE"):
+    if data.get("status") is not None:
         result += [
             html.H4("Status"),
             html.P(data["status"]),
@@ -236,10 +299,11 @@ def displayTapNodeData(data):
     Input("tabs", "value"),
     prevent_initial_call=True,
 )
+@metrics.instrument
 def switchToTimelineText(tab):
     if tab == "timeline":
         return html.H4(
-            "Arrows show dependency relationships. To see additional information, hover on the timeline bars."
+            "Arrows show dependency relationships. Outlined bars are on the critical path, which decides the finish date. To see additional information, hover on the timeline bars."
         )
 
 
@@ -0,0 +1,159 @@
+# CACHE OF PARSED WORKBOOKS
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import typing
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 (only needed for feather files)
+except ImportError:
+    pyarrow = None
+
+CACHE_DIR = ".loeviz_cache"
+# version of the validation and of the cached data, part of every entry's name;
+# bump it when either changes, so entries validated by older code are not used
+FORMAT_VERSION = 2
+# extension of the file holding the warnings logged when an entry was validated
+WARNINGS = ".warnings.json"
+# entries of each workbook are dropped, oldest first, past this many
+MAX_ENTRIES = 16
+
+
+def file_hash(filename: str) -> str:
+    """Get the SHA-256 hash of the contents of a file."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_dir(filename: str) -> str:
+    """Get the cache directory for a workbook, a subdirectory named after it in the
+    cache directory next to it, so every workbook keeps its own entries."""
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0])
+
+
+def entry_path(filename: str, content_hash: str) -> str:
+    """Get the path of a workbook version's cache entry, without its extension."""
+    return os.path.join(cache_dir(filename), f"v{FORMAT_VERSION}-{content_hash}")
+
+
+def read_cached(
+    filename: str, content_hash: str
+) -> typing.Optional[tuple[pd.DataFrame, list[str]]]:
+    """Get the cached data for a version of a workbook, if there is any.
+
+    Args:
+        filename (str): The path to the workbook.
+        content_hash (str): The file_hash of the workbook's contents.
+
+    Returns:
+        typing.Optional[tuple[pd.DataFrame, list[str]]]: The cached data and the
+            warnings found when it was validated, or None on a cache miss.
+    """
+    path = entry_path(filename, content_hash)
+    try:
+        if pyarrow is not None and os.path.exists(path + ".feather"):
+            df = pd.read_feather(path + ".feather")
+        elif os.path.exists(path + ".pkl"):
+            df = pd.read_pickle(path + ".pkl")
+        else:
+            return None
+        warnings = []
+        if os.path.exists(path + WARNINGS):
+            with open(path + WARNINGS) as f:
+                warnings = json.load(f)
+        return df, warnings
+    except Exception as e:
+        logging.warning(f'Ignoring unreadable cache entry "{path}": {e}')
+    return None
+
+
+def write_cached(
+    filename: str,
+    content_hash: str,
+    df: pd.DataFrame,
+    warnings: typing.Sequence[str] = (),
+):
+    """Cache the data for a version of a workbook.
+
+    Feather is used when pyarrow is installed, with pickle as the fallback (also
+    for data Feather cannot store, such as columns of mixed types). Entries are
+    written to a temporary file and renamed into place, so readers never see a
+    partial entry. Failing to write the cache is logged but is not an error.
+
+    Args:
+        filename (str): The path to the workbook.
+        content_hash (str): The file_hash of the workbook's contents.
+        df (pd.DataFrame): The data to cache.
+        warnings (Sequence[str]): The warnings found when validating the data, to
+            log again when it is read from the cache.
+    """
+    directory = cache_dir(filename)
+    path = entry_path(filename, content_hash)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # written before the data, so an entry is never read without its warnings
+        if warnings:
+            _write_atomic(
+                directory,
+                path + WARNINGS,
+                lambda temp_path: _write_json(temp_path, list(warnings)),
+            )
+
+        def write_data(temp_path):
+            if pyarrow is not None:
+                try:
+                    df.reset_index(drop=True).to_feather(temp_path)
+                    return ".feather"
+                except Exception:
+                    pass
+            df.to_pickle(temp_path)
+            return ".pkl"
+
+        _write_atomic(directory, path, write_data)
+        prune(directory)
+    except OSError as e:
+        logging.warning(f'Could not write cache entry in "{directory}": {e}')
+
+
+def _write_json(path: str, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def _write_atomic(
+    directory: str, path: str, write: typing.Callable[[str], typing.Optional[str]]
+):
+    """Write a file through a temporary file that is renamed into place, adding the
+    extension write returns (if any) to path."""
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        extension = write(temp_path) or ""
+        os.replace(temp_path, path + extension)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def prune(directory: str):
+    """Remove the oldest cache entries of a workbook past MAX_ENTRIES."""
+    entries = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith((".feather", ".pkl"))
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[MAX_ENTRIES:]:
+        os.remove(path)
+        warnings = os.path.splitext(path)[0] + WARNINGS
+        if os.path.exists(warnings):
+            os.remove(warnings)
@@ -1,8 +1,20 @@
 import pandas as pd
+import numpy as np
+import datetime
 import typing
 import logging
 import sys
 import re
+import os
+import itertools
+import tempfile
+import shutil
+
+import openpyxl
+
+import cache
+import metrics
+from graph import strongly_connected_components
 
 
 def validate_columns(df: pd.DataFrame):
@@ -28,135 +40,734 @@ def validate_columns(df: pd.DataFrame):
         sys.exit(-1)
 
 
-def validate_ids(df: pd.DataFrame):
+ID_PATTERN = re.compile(
+    r"loe[1-9]+|o[1-9]+\.[1-9]+|io[1-9]+\.[1-9]+\.[1-9]+", re.IGNORECASE
+)
+STATUSES = {"overdue", "at risk", "on track", "complete"}
+# rows read and checked at a time by read_workbook
+CHUNK_SIZE = 10_000
+# passes of peeling off tasks that cannot be on a dependency loop before searching
+# the rest for loops (see validate_integrity); each pass peels one level of a chain
+PEEL_ROUNDS = 100
+
+
+class Violation(typing.NamedTuple):
+    """A single problem found in the spreadsheet.
+
+    Attributes:
+        row (int): The spreadsheet row of the problem (the header is row 1).
+        column (str): The column of the problem.
+        value (typing.Any): The offending cell value.
+        message (str): A description of the problem.
+        severity (str): "error" if the data is rejected because of the problem, or
+            "warning" if it is only logged.
+    """
+
+    row: int
+    column: str
+    value: typing.Any
+    message: str
+    severity: str = "error"
+
+
+def _violations(
+    df: pd.DataFrame, mask: pd.Series, column: str, message: str
+) -> list[Violation]:
+    """Build a Violation for every row of df selected by mask.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the project data.
+        mask (pd.Series): Boolean mask of the offending rows.
+        column (str): The column that was checked.
+        message (str): Message template, formatted with the offending value.
+
+    Returns:
+        list[Violation]: One violation per offending row.
+    """
+    return [
+        Violation(ind + 2, column, value, message.format(value))
+        for ind, value in df.loc[mask, column].items()
+    ]
+
+
+def _valid_ids(df: pd.DataFrame) -> pd.Series:
+    """Get whether each ID matches ID_PATTERN."""
+    return df["ID"].astype(object).str.fullmatch(ID_PATTERN).fillna(False).astype(bool)
+
+
+def validate_ids(
+    df: pd.DataFrame, valid: typing.Optional[pd.Series] = None
+) -> list[Violation]:
     """Validates that all IDs are in the correct format and unique.
 
     Args:
         df (pd.DataFrame): The DataFrame containing the project data.
+        valid (Optional[pd.Series]): Whether each ID is in the correct format, if
+            already known (see _valid_ids).
+
+    Returns:
+        list[Violation]: Every invalid or duplicate ID.
     """
-    for actual in df["ID"]:
-        actual = actual.lower()
-        if not (
-            re.fullmatch(r"loe[1-9]+", actual) is not None
-            or re.fullmatch(r"o[1-9]+\.[1-9]+", actual) is not None
-            or re.fullmatch(r"io[1-9]+\.[1-9]+\.[1-9]+", actual) is not None
-        ):
-            logging.error(f'Invalid ID "{actual}", rejecting data')
-            sys.exit(-1)
-    uniques = set()
-    for actual in df["ID"]:
-        actual = actual.lower()
-        if actual in uniques:
-            logging.error(f'Duplicate ID "{actual}", rejecting data')
-            sys.exit(-1)
-        uniques.add(actual)
+    ids = df["ID"].astype(object)
+    valid = _valid_ids(df) if valid is None else valid
+    lowered = ids.str.lower()
+    duplicate = lowered.duplicated() & lowered.notna()
+    return _violations(df, ~valid, "ID", 'Invalid ID "{}"') + _violations(
+        df, valid & duplicate, "ID", 'Duplicate ID "{}"'
+    )
+
+
+def _as_dates(column: pd.Series) -> pd.Series:
+    """Get a date column as datetime64, with NaT for cells that are not Excel dates."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    is_date = column.map(type).isin([pd.Timestamp, datetime.datetime])
+    return pd.to_datetime(column.where(is_date), errors="coerce")
 
 
-def validate_dates(df: pd.DataFrame):
+def validate_dates(df: pd.DataFrame) -> list[Violation]:
     """Validates that all start and end dates are in the correct format and order.
 
     Args:
         df (pd.DataFrame): The DataFrame containing the project data.
+
+    Returns:
+        list[Violation]: Every invalid date and every start date on or after its end
+            date.
     """
-    for start, end in zip(df["Start Date"], df["End Date"]):
-        if not isinstance(start, pd.Timestamp):
-            logging.error(f'Invalid date data "{start}"')
-            sys.exit(-1)
-        elif not isinstance(end, pd.Timestamp):
-            logging.error(f'Invalid date data "{end}"')
-            sys.exit(-1)
-        elif start >= end:
-            logging.error(f'Goal start date "{start}" is on or after end date "{end}"')
-            sys.exit(-1)
+    start = _as_dates(df["Start Date"])
+    end = _as_dates(df["End Date"])
+    result = _violations(
+        df, start.isna(), "Start Date", 'Invalid date data "{}"'
+    ) + _violations(df, end.isna(), "End Date", 'Invalid date data "{}"')
+    for ind in df.index[start >= end]:
+        result.append(
+            Violation(
+                ind + 2,
+                "Start Date",
+                start[ind],
+                f'Goal start date "{start[ind]}" is on or after end date "{end[ind]}"',
+            )
+        )
+    return result
 
 
-def validate_statuses(df: pd.DataFrame):
+def validate_statuses(df: pd.DataFrame) -> list[Violation]:
     """Validate that all project statuses are in the expected set.
 
     Args:
         df (pd.DataFrame): The DataFrame containing the project data.
+
+    Returns:
+        list[Violation]: Every unknown status.
     """
-    EXPECTED = {"overdue", "at risk", "on track", "complete"}
-    for status in df["Status"]:
-        status = status.lower()
-        if status not in EXPECTED:
-            logging.error(f'Invalid project status "{status}"')
-            sys.exit(-1)
+    valid = df["Status"].astype(object).str.lower().isin(STATUSES)
+    return _violations(df, ~valid, "Status", 'Invalid project status "{}"')
 
 
-def validate_dependencies(df: pd.DataFrame):
+def validate_dependencies(
+    df: pd.DataFrame, edges: typing.Optional[pd.DataFrame] = None
+) -> list[Violation]:
     """Validate that all project dependencies are in the correct format and exist.
 
     Args:
         df (pd.DataFrame): The DataFrame containing the project data.
+        edges (Optional[pd.DataFrame]): The dependency_edges of df, if already
+            split.
+
+    Returns:
+        list[Violation]: Every dependency on an ID that is not in the spreadsheet.
+    """
+    edges = dependency_edges(df) if edges is None else edges
+    missing = ~edges["Dependency"].isin(set(df["ID"]))
+    return [
+        Violation(
+            ind + 2, "Dependencies", dependency, f'Invalid dependency "{dependency}"'
+        )
+        for ind, dependency in edges.loc[missing, "Dependency"].items()
+    ]
+
+
+def _parse_ids(ids: pd.Series) -> pd.DataFrame:
+    """Split IDs into their kind (LOE, O or IO) and the IDs of their parents.
+
+    Returns:
+        pd.DataFrame: Columns "kind", "loe" (the LOE the task belongs to, for every
+            valid ID) and "objective" (the objective an IO belongs to), all
+            uppercase, indexed like ids.
+    """
+    parts = (
+        ids.astype(object)
+        .str.upper()
+        .str.extract(r"^(LOE|IO|O)([1-9]+)(?:\.([1-9]+))?", expand=True)
+    )
+    return pd.DataFrame(
+        {
+            "kind": parts[0],
+            "loe": "LOE" + parts[1],
+            "objective": ("O" + parts[1] + "." + parts[2]).where(parts[0] == "IO"),
+        }
+    )
+
+
+def validate_integrity(
+    df: pd.DataFrame,
+    valid: typing.Optional[pd.Series] = None,
+    edges: typing.Optional[pd.DataFrame] = None,
+) -> list[Violation]:
+    """Validate the dependency graph and the LOE/objective hierarchy as a whole.
+
+    Finds, in time linear in the rows and dependencies:
+    - circular dependencies, including tasks that depend on themselves (errors,
+      since statuses cannot be worked out around a loop); each loop is reported
+      with one path around it
+    - objectives and IOs whose LOE has no row (errors, since the network cannot
+      draw a task outside its LOE)
+    - IOs whose objective has no row (warnings)
+    - LOE dependencies on tasks of other LOEs (warnings, since the network only
+      shows dependencies of objectives and IOs; an LOE listing its own tasks is
+      how the template rolls their statuses up)
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the project data.
+        valid (Optional[pd.Series]): Whether each ID is in the correct format, if
+            already known (see _valid_ids).
+        edges (Optional[pd.DataFrame]): The dependency_edges of df, if already
+            split.
+
+    Returns:
+        list[Violation]: Every problem found.
     """
-    for dependency_list in df["Dependencies"]:
-        if not isinstance(dependency_list, str):
+    result = []
+    ids = df["ID"].astype(object)
+    valid = _valid_ids(df) if valid is None else valid
+    edges = dependency_edges(df) if edges is None else edges
+    parsed = _parse_ids(df["ID"])
+    known = set(ids.str.upper().dropna())
+
+    # hierarchy
+    task = valid & parsed["kind"].isin(["O", "IO"])
+    for ind in df.index[task & ~parsed["loe"].isin(known)]:
+        result.append(
+            Violation(
+                ind + 2,
+                "ID",
+                ids[ind],
+                f'LOE "{parsed.at[ind, "loe"]}" of "{ids[ind]}" is not in the '
+                "spreadsheet",
+            )
+        )
+    io = valid & (parsed["kind"] == "IO")
+    for ind in df.index[io & ~parsed["objective"].isin(known)]:
+        result.append(
+            Violation(
+                ind + 2,
+                "ID",
+                ids[ind],
+                f'Objective "{parsed.at[ind, "objective"]}" of "{ids[ind]}" is not in '
+                "the spreadsheet",
+                "warning",
+            )
+        )
+
+    edges = edges[edges["Dependency"].isin(set(ids))]
+    # LOE dependencies outside the LOE
+    loe_edges = edges[edges["ID"].isin(set(ids[parsed["kind"] == "LOE"]))]
+    foreign = _parse_ids(loe_edges["Dependency"])["loe"] != loe_edges["ID"].str.upper()
+    for ind, edge in loe_edges[foreign].iterrows():
+        result.append(
+            Violation(
+                ind + 2,
+                "Dependencies",
+                edge["Dependency"],
+                f'LOE "{edge["ID"]}" depends on "{edge["Dependency"]}" of another LOE, '
+                "which the network does not show",
+                "warning",
+            )
+        )
+
+    # circular dependencies; a task without dependencies or without dependents
+    # cannot be on a loop, so such tasks are peeled off, as integer codes, until
+    # only loops and the tasks between them are left (or PEEL_ROUNDS passes are
+    # made), and only what is left is searched
+    codes = pd.Index(ids.dropna().unique())
+    sources = codes.get_indexer(edges["ID"])
+    targets = codes.get_indexer(edges["Dependency"])
+    live = sources >= 0
+    for _ in range(PEEL_ROUNDS):
+        linked = (np.bincount(sources[live], minlength=len(codes)) > 0) & (
+            np.bincount(targets[live], minlength=len(codes)) > 0
+        )
+        peeled = live & linked[sources] & linked[targets]
+        if (peeled == live).all():
+            break
+        live = peeled
+    edges = edges[live]
+    successors = {}
+    for task_id, dependency in zip(edges["ID"].tolist(), edges["Dependency"].tolist()):
+        successors.setdefault(task_id, []).append(dependency)
+    rows = None
+    for component in strongly_connected_components(
+        successors, lambda task_id: successors.get(task_id, ())
+    ):
+        if len(component) == 1 and component[0] not in successors.get(component[0], ()):
             continue
-        dependencies = dependency_list.split(",")
-        for dependency in dependencies:
-            if not (df["ID"] == dependency).any():
-                logging.error(f"Invalid dependencies \"{','.join(dependencies)}\"")
-                sys.exit(-1)
+        if rows is None:
+            rows = dict(zip(ids.tolist(), df.index.tolist()))
+        members = set(component)
+        start = min(component, key=rows.get)
+        # walk inside the component until a task repeats, which closes a loop
+        path = [start]
+        seen = {start: 0}
+        while True:
+            following = next(dep for dep in successors[path[-1]] if dep in members)
+            if following in seen:
+                cycle = path[seen[following] :] + [following]
+                break
+            seen[following] = len(path)
+            path.append(following)
+        message = f"Circular dependency {' -> '.join(cycle)}"
+        if len(cycle) == 2:
+            message = f'"{cycle[0]}" depends on itself'
+        elif len(members) > len(cycle) - 1:
+            message += f" ({len(members)} tasks depend on each other in total)"
+        row = rows[cycle[0]]
+        result.append(
+            Violation(row + 2, "Dependencies", df.at[row, "Dependencies"], message)
+        )
+    return result
+
+
+def validate_data(df: pd.DataFrame) -> list[Violation]:
+    """Run every row-level check on the spreadsheet in one pass.
+
+    Unlike validate_columns, these checks do not stop at the first problem, so that
+    all of them can be fixed in one edit.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the project data. Its columns must
+            already have passed validate_columns.
+
+    Returns:
+        list[Violation]: Every problem found, ordered by spreadsheet row.
+    """
+    violations = validate_dates(df) + validate_statuses(df) + _validate_sheet(df)
+    return sorted(violations, key=lambda violation: violation.row)
+
+
+def _validate_sheet(df: pd.DataFrame) -> list[Violation]:
+    """Run the checks that need the whole sheet (IDs, dependencies and integrity),
+    matching the IDs and splitting the dependencies only once for all of them."""
+    valid = _valid_ids(df)
+    edges = dependency_edges(df)
+    return (
+        validate_ids(df, valid)
+        + validate_dependencies(df, edges)
+        + validate_integrity(df, valid, edges)
+    )
+
+
+def read_workbook(
+    filename: str, chunk_size: int = CHUNK_SIZE
+) -> tuple[pd.DataFrame, list[Violation]]:
+    """Read and validate the first sheet of a workbook, streaming it in chunks.
 
+    The workbook is opened in openpyxl's read-only mode, so its rows are read one at
+    a time rather than building the whole workbook in memory. Each chunk of rows is
+    checked as soon as it is read; the checks that need the whole sheet (duplicate
+    IDs and dependencies) run once at the end. Peak memory is roughly the size of the
+    resulting DataFrame. Like pd.read_excel, trailing empty rows are left out.
 
-def process_statuses(df: pd.DataFrame) -> pd.DataFrame:
+    Args:
+        filename (str): The path to the worksheet.
+        chunk_size (int): The number of rows to read and check at a time.
+
+    Returns:
+        tuple[pd.DataFrame, list[Violation]]: The project data, indexed by
+            spreadsheet row minus 2 (as pd.read_excel would), and every problem found
+            in it, ordered by spreadsheet row.
+    """
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        validate_columns(pd.DataFrame(columns=header))
+
+        chunks = []
+        violations = []
+        last_row = -1
+        for start in itertools.count(0, chunk_size):
+            # rows can be shorter or longer than the header in read-only mode
+            values = [
+                row[: len(header)] + (None,) * (len(header) - len(row))
+                for row in itertools.islice(rows, chunk_size)
+            ]
+            if not values:
+                break
+            chunk = pd.DataFrame(
+                values, columns=header, index=range(start, start + len(values))
+            )
+            # empty rows are only a problem if data follows them, which the ID check
+            # at the end catches
+            filled = chunk.dropna(how="all")
+            if not filled.empty:
+                last_row = filled.index[-1]
+            violations += validate_dates(filled) + validate_statuses(filled)
+            chunks.append(chunk)
+    finally:
+        workbook.close()
+
+    df = pd.concat(chunks) if chunks else pd.DataFrame(columns=header)
+    df = df.loc[:last_row]
+    violations += _validate_sheet(df)
+    return df, sorted(violations, key=lambda violation: violation.row)
+
+
+def dependency_edges(df: pd.DataFrame) -> pd.DataFrame:
+    """Split the comma-separated dependency lists into one row per dependency.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the project data.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns "ID" (the dependent task) and
+            "Dependency" (the task it depends on), indexed by the row of the dependent
+            task in df. Rows without a dependency list are left out.
+    """
+    dependencies = df["Dependencies"].astype(object).str.split(",").explode().dropna()
+    return pd.DataFrame(
+        {"ID": df.loc[dependencies.index, "ID"], "Dependency": dependencies}
+    )
+
+
+def process_statuses(
+    df: pd.DataFrame, today: typing.Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
     """Update the statuses of each different task in a project to reflect the current
     overall state.
 
     Args:
         df (pd.DataFrame): The DataFrame containing the project data.
+        today (Optional[pd.Timestamp]): The current time; now if not given.
 
     Returns:
         pd.DataFrame: A new DataFrame containing the updated project data.
     """
-    overdue_updated = df.copy()
-    for ind, row in df.iterrows():
-        if (
-            row["End Date"] < pd.Timestamp.today()
-            and row["Status"].lower() != "complete"
+    today = pd.Timestamp.today() if today is None else today
+    result = df.copy()
+    result["Status"], overdue = _mark_overdue(result, today)
+    blocked = _blocked(result, result.loc[overdue, "ID"])
+    result.loc[blocked & ~overdue, "Status"] = "At Risk"
+    return result
+
+
+def _mark_overdue(df: pd.DataFrame, today: pd.Timestamp) -> tuple[pd.Series, pd.Series]:
+    """Mark unfinished tasks past their end date as overdue.
+
+    Returns:
+        tuple[pd.Series, pd.Series]: The statuses with late tasks marked "Overdue",
+            and whether each task is overdue (including tasks that already were).
+    """
+    late = (df["End Date"] < today) & (df["Status"].str.lower() != "complete")
+    statuses = df["Status"].mask(late, "Overdue")
+    return statuses, statuses.str.lower() == "overdue"
+
+
+def _blocked(df: pd.DataFrame, overdue_ids) -> pd.Series:
+    """Find the tasks that depend on an overdue task.
+
+    Args:
+        df (pd.DataFrame): The tasks to check.
+        overdue_ids (Iterable[str]): The IDs of all overdue tasks.
+
+    Returns:
+        pd.Series: Whether each task in df depends on an overdue task.
+    """
+    edges = dependency_edges(df)
+    return (
+        edges["Dependency"]
+        .isin(overdue_ids)
+        .groupby(level=0)
+        .any()
+        .reindex(df.index, fill_value=False)
+    )
+
+
+# the columns processed statuses depend on; other columns are passed through as-is
+HASHED = ["ID", "End Date", "Status", "Dependencies"]
+
+
+class StatusIndex:
+    """Processes the statuses of successive versions of a workbook, recomputing
+    only the tasks that may have changed since the previous version.
+
+    A task's processed status depends only on its own row, the time, and whether
+    the tasks it depends on are overdue (see process_statuses). So every row is
+    hashed (the columns in HASHED), and only rows whose hash changed, rows whose
+    end date passed since the previous version, and the dependents of tasks that
+    became or stopped being overdue are processed again; every other task keeps its
+    previous status. The dependents are found with a reverse-dependency index,
+    which is updated from the changed rows only.
+
+    The first version, any version whose IDs are not unique and the version after
+    it are processed in full. The result is always the same as process_statuses
+    would give.
+    """
+
+    def __init__(self):
+        # task ID -> row hash, dependency list, overdue flag and processed status
+        # of the previous version
+        self._rows = None
+        # task ID -> IDs of the tasks that depend on it
+        self._dependents = {}
+        self._today = None
+
+    def process(
+        self, df: pd.DataFrame, today: typing.Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        """Update the statuses of a new version of the project data.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the project data.
+            today (Optional[pd.Timestamp]): The current time; now if not given.
+
+        Returns:
+            pd.DataFrame: A new DataFrame containing the updated project data.
+        """
+        today = pd.Timestamp.today() if today is None else today
+        if not df["ID"].is_unique:
+            # tasks cannot be matched up with the next version by ID either, so it
+            # is processed in full too
+            self._rows = None
+            return process_statuses(df, today)
+        # most cells are unique, so categorizing them before hashing does not pay
+        hashes = pd.util.hash_pandas_object(
+            df[HASHED], index=False, categorize=False
+        ).to_numpy()
+        if self._rows is None:
+            result = process_statuses(df, today)
+            self._dependents = {}
+            for task, dependency in dependency_edges(df).itertuples(index=False):
+                self._dependents.setdefault(dependency, set()).add(task)
+            overdue = result["Status"].str.lower() == "overdue"
+        else:
+            result, overdue = self._update(df, hashes, today)
+        self._rows = pd.DataFrame(
+            {
+                "hash": hashes,
+                "dependencies": df["Dependencies"].to_numpy(),
+                "overdue": overdue.to_numpy(),
+                "status": result["Status"].to_numpy(),
+            },
+            index=df["ID"].to_numpy(),
+        )
+        self._today = today
+        return result
+
+    def _update(
+        self, df: pd.DataFrame, hashes, today: pd.Timestamp
+    ) -> tuple[pd.DataFrame, pd.Series]:
+        """Process the rows of df that may have changed since the previous version.
+
+        Returns:
+            tuple[pd.DataFrame, pd.Series]: The updated project data, and whether
+                each task is overdue.
+        """
+        previous = self._rows
+        ids = df["ID"].to_numpy()
+        # position of every task in the previous version, or -1 for new tasks
+        position = previous.index.get_indexer(ids)
+        known = position >= 0
+        changed = ~known
+        changed[known] |= previous["hash"].to_numpy()[position[known]] != hashes[known]
+
+        # tasks whose end date passed (or, with the clock turned back, came back)
+        # since the previous version may have become overdue or stopped being
+        earlier, later = sorted([self._today, today])
+        ends = df["End Date"]
+        crossed = ((ends >= earlier) & (ends < later)).to_numpy()
+
+        # update the reverse-dependency index with the changed and removed rows
+        removed = previous.index[~previous.index.isin(ids)]
+        for task, dependencies in itertools.chain(
+            zip(
+                ids[changed & known],
+                previous["dependencies"].to_numpy()[position[changed & known]],
+            ),
+            previous.loc[removed, "dependencies"].items(),
         ):
-            row["Status"] = "Overdue"
-        overdue_updated.loc[ind] = row
-    dependency_updated = overdue_updated.copy()
-    for ind, row in overdue_updated.iterrows():
-        dependency_list = row["Dependencies"]
-        if not isinstance(dependency_list, str):
-            continue
-        dependencies = dependency_list.split(",")
-        for dep in dependencies:
-            dep_ind = overdue_updated.index[overdue_updated["ID"] == dep].to_list()[0]
-            dep_row = overdue_updated.loc[dep_ind]
-            if (
-                dep_row["Status"].lower() == "overdue"
-                and row["Status"].lower() != "overdue"
-            ):
-                dependency_updated.at[ind, "Status"] = "At Risk"
-    return dependency_updated
-
-
-def load_data(filename: str) -> pd.DataFrame:
+            for dependency in _split(dependencies):
+                self._dependents.get(dependency, set()).discard(task)
+        for task, dependencies in zip(
+            ids[changed], df["Dependencies"].to_numpy()[changed]
+        ):
+            for dependency in _split(dependencies):
+                self._dependents.setdefault(dependency, set()).add(task)
+
+        # overdue flags, recomputed for changed rows and rows whose end date passed
+        recheck = changed | crossed
+        statuses = pd.Series(
+            previous["status"].to_numpy()[position], index=df.index, dtype=object
+        )
+        overdue = pd.Series(
+            previous["overdue"].to_numpy()[position] & known, index=df.index
+        )
+        overdue[recheck] = _mark_overdue(df[recheck], today)[1]
+        overdue = overdue.astype(bool)
+        flipped = recheck.copy()
+        flipped[recheck & known] = (
+            overdue[recheck & known].to_numpy()
+            != previous["overdue"].to_numpy()[position[recheck & known]]
+        )
+
+        # reprocess the rows that changed, and every dependent of a task that
+        # became or stopped being overdue (or was removed)
+        affected = set(ids[recheck])
+        for task in itertools.chain(ids[flipped], removed):
+            affected |= self._dependents.get(task, set())
+        affected = df["ID"].isin(affected).to_numpy()
+        subset = df[affected]
+        statuses[affected], subset_overdue = _mark_overdue(subset, today)
+        blocked = _blocked(subset, ids[overdue.to_numpy()])
+        statuses[blocked.index[blocked & ~subset_overdue]] = "At Risk"
+
+        result = df.copy()
+        result["Status"] = statuses
+        return result, overdue
+
+
+def _split(dependencies) -> list[str]:
+    """Split a cell of the Dependencies column into dependency IDs."""
+    return dependencies.split(",") if isinstance(dependencies, str) else []
+
+
+def write_statuses(
+    filename: str,
+    loaded: pd.DataFrame,
+    result: pd.DataFrame,
+    update_cells: bool = False,
+) -> bool:
+    """Write processed statuses back to the workbook, if any of them changed.
+
+    The new workbook is written to a temporary file next to the original and renamed
+    over it, so the workbook is never left half-written.
+
+    Args:
+        filename (str): The path to the worksheet.
+        loaded (pd.DataFrame): The project data as it was read from the worksheet.
+        result (pd.DataFrame): The project data with processed statuses.
+        update_cells (bool): If True, only the changed Status cells are updated in
+            the existing workbook, which keeps its formatting and any other sheets.
+            Otherwise the sheet is rewritten from result.
+
+    Returns:
+        bool: Whether the workbook was written.
+    """
+    changed = result["Status"] != loaded["Status"]
+    if not changed.any():
+        return False
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    # a dotfile, so it is not taken for a project while it exists (see projects.py)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".~loeviz-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        if update_cells:
+            workbook = openpyxl.load_workbook(filename)
+            sheet = workbook.worksheets[0]
+            column = list(result.columns).index("Status") + 1
+            for ind, status in result.loc[changed, "Status"].items():
+                # row 1 is the header
+                sheet.cell(row=ind + 2, column=column, value=status)
+            workbook.save(temp_path)
+        else:
+            result.to_excel(
+                temp_path, sheet_name="LOEs, IOs, and Objectives", index=False
+            )
+        # mkstemp makes the file private to its owner; keep the workbook's permissions
+        shutil.copymode(filename, temp_path)
+        os.replace(temp_path, filename)
+    except OSError as e:
+        # most likely the workbook is open in Excel
+        logging.warning(f'Could not write updated statuses to "{filename}": {e}')
+        return False
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def load_data(
+    filename: str,
+    use_cache: bool = True,
+    update_cells: bool = False,
+    statuses: typing.Optional[StatusIndex] = None,
+) -> pd.DataFrame:
     """Load project data from an Excel worksheet.
 
+    The workbook is streamed and validated by read_workbook. The validated data is
+    cached in a binary format, keyed by a hash of the workbook's contents (and the
+    version of the validation), so loading an unchanged workbook again skips parsing
+    and validation; the warnings found are cached with it and logged again. Statuses are
+    processed on every load since they depend on the current date, and written back
+    to the workbook only if they changed (see write_statuses).
+
     Args:
         filename (str): The path to the worksheet.
+        use_cache (bool): Whether to read and write the cache.
+        update_cells (bool): Whether to write changed statuses into the existing
+            workbook cell by cell, rather than rewriting the sheet.
+        statuses (Optional[StatusIndex]): If given, statuses are processed with it,
+            only recomputing the tasks that changed since the workbook was last
+            loaded with the same index.
 
     Returns:
         pd.DataFrame: A Pandas DataFrame containing the project data.
     """
     try:
-        df = pd.read_excel(filename)
+        with metrics.stage("hash"):
+            content_hash = cache.file_hash(filename)
+        with metrics.stage("read_cache"):
+            entry = cache.read_cached(filename, content_hash) if use_cache else None
+        cached = entry is not None
+        if cached:
+            df, warnings = entry
+        else:
+            with metrics.stage("read_workbook"):
+                df, violations = read_workbook(filename)
     except FileNotFoundError as e:
         logging.error(f'Did not find file "{filename}"')
         sys.exit(-1)
-    except e:
-        logging.error(f'Encountered unexpected error "{e.strerror}"')
+    except Exception as e:
+        logging.error(f'Encountered unexpected error "{e}"')
         sys.exit(-1)
-    validate_columns(df)
-    validate_ids(df)
-    validate_dates(df)
-    validate_statuses(df)
-    validate_dependencies(df)
-    result = process_statuses(df)
-    result.to_excel(filename, sheet_name="LOEs, IOs, and Objectives", index=False)
+    if cached:
+        for warning in warnings:
+            logging.warning(warning)
+    else:
+        for violation in violations:
+            log = logging.error if violation.severity == "error" else logging.warning
+            log(f"Row {violation.row}, {violation.column}: {violation.message}")
+        errors = [v for v in violations if v.severity == "error"]
+        if errors:
+            logging.error(f"Found {len(errors)} problem(s), rejecting data")
+            sys.exit(-1)
+        warnings = [
+            f"Row {v.row}, {v.column}: {v.message}"
+            for v in violations
+            if v.severity == "warning"
+        ]
+        if use_cache:
+            with metrics.stage("write_cache"):
+                cache.write_cached(filename, content_hash, df, warnings)
+    with metrics.stage("process_statuses"):
+        result = process_statuses(df) if statuses is None else statuses.process(df)
+    with metrics.stage("write_statuses"):
+        written = write_statuses(filename, df, result, update_cells)
+    if written and use_cache:
+        # the workbook now holds the processed data, which is valid as it stands
+        with metrics.stage("write_cache"):
+            cache.write_cached(filename, cache.file_hash(filename), result, warnings)
     return result
@@ -1,76 +1,56 @@
 # GENERATE ELEMENTS
 
-import data_loading
-import re
+import numpy as np
+import pandas as pd
 
-project_data = data_loading.load_data("project_state.xlsx")
+from data_loading import dependency_edges
+from graph import ElementStore
 
-loes = []
-objs = []
-ios = []
-deps = []
 
-for _, row in project_data.iterrows():
-    if row["ID"].startswith("LOE"):
-        loes.append(
-            {
-                "data": {
-                    "id": row["ID"],
-                    "label": row["ID"],
-                    "description": row["Description"],
-                },
-                "position": {"x": 0, "y": 0},
-                "classes": "loe",
-            }
-        )
-    elif row["ID"].startswith("O"):
-        parent_id = f"LOE{row['ID'].split('.')[0][1:]}"
-        objs.append(
-            {
-                "data": {
-                    "id": row["ID"],
-                    "label": row["ID"],
-                    "description": row["Description"],
-                    "status": row["Status"].lower(),
-                    "parent": parent_id,
-                },
-                "position": {
-                    "x": 0,
-                    "y": 0,
-                },
-                "classes": "obj",
-            }
-        )
-    elif row["ID"].startswith("IO"):
-        parent_id = f"LOE{row['ID'].split('.')[0][2:]}"
-        objs.append(
-            {
-                "data": {
-                    "id": row["ID"],
-                    "label": row["ID"],
-                    "description": row["Description"],
-                    "status": row["Status"].lower(),
-                    "parent": parent_id,
-                },
-                "position": {
-                    "x": 0,
-                    "y": 0,
-                },
-                "classes": "io",
-            }
-        )
-    if not isinstance(row["Dependencies"], str):
-        continue
-    dependencies = row["Dependencies"].split(",")
-    deps += [
-        {"data": {"source": row["ID"], "target": dependency}, "classes": "dep"}
-        for dependency in dependencies
-        if not row["ID"].startswith("LOE")
-    ]
+def build_elements(project_data: pd.DataFrame) -> ElementStore:
+    """Generate the cytoscape LOE nodes, objective nodes and dependency edges.
 
-# aggregate elements
-loes_list = [loe["data"]["id"] for loe in loes]
-nodes = objs + ios
-nodes_list = [node["data"]["id"] for node in nodes]
-edges = deps
-all_elements = loes + nodes + edges
+    The elements are built column by column from the data, without a dict per
+    element (see ElementStore).
+
+    Args:
+        project_data (pd.DataFrame): The validated and processed project data.
+
+    Returns:
+        ElementStore: The LOE nodes, then the objective and intermediate objective
+            nodes, then the dependency edges, each in the order of the data.
+    """
+    ids = project_data["ID"].astype(object)
+    is_loe = ids.str.startswith("LOE")
+    # objectives (O1.2) and intermediate objectives (IO1.2.3) of LOE1
+    numbers = ids.str.extract(r"^I?O(\d+)\.", expand=False)
+    is_obj = numbers.notna() & ~is_loe
+    loes = project_data[is_loe]
+    objs = project_data[is_obj]
+    # LOEs depend on their objectives, which the network does not show as edges
+    deps = dependency_edges(objs)
+
+    node_ids = pd.concat([loes["ID"], objs["ID"]]).tolist()
+    statuses = objs["Status"].str.lower().tolist()
+    parents = ("LOE" + numbers[is_obj]).tolist()
+    no_data = [None] * len(loes)
+    no_node_data = [None] * len(deps)
+    data = {
+        "id": node_ids + no_node_data,
+        "label": node_ids + no_node_data,
+        "description": pd.concat([loes["Description"], objs["Description"]]).tolist()
+        + no_node_data,
+        "status": no_data + statuses + no_node_data,
+        "parent": no_data + parents + no_node_data,
+        "source": [None] * len(node_ids) + deps["ID"].tolist(),
+        "target": [None] * len(node_ids) + deps["Dependency"].tolist(),
+    }
+    classes = (
+        ["loe"] * len(loes)
+        + np.where(objs["ID"].str.startswith("IO"), "io", "obj").tolist()
+        + ["dep"] * len(deps)
+    )
+    # nodes start at (0, 0) until the graph is laid out; edges have no position
+    positions = np.zeros((len(classes), 2))
+    positions[len(node_ids) :] = np.nan
+    return ElementStore(data, classes, positions)
@@ -0,0 +1,555 @@
+# GRAPH INDEXING
+
+import math
+from collections import defaultdict
+from functools import lru_cache
+from typing import Optional, Union
+
+import numpy as np
+
+# number of distinct LOE selections whose element positions are kept by each graph
+SELECTION_CACHE_SIZE = 128
+# directions a neighborhood query can follow dependency edges in
+DIRECTIONS = ("both", "upstream", "downstream")
+# edge classes that link both ends to each other, whatever the direction
+SYMMETRIC_CLASSES = {"interdep"}
+# layout spacing, in cytoscape pixels, between nodes in a row, between rows, and
+# between the blocks of neighboring LOEs
+NODE_SPACING = 80
+RANK_SPACING = 100
+BLOCK_SPACING = 120
+
+
+class ElementStore:
+    """Cytoscape elements stored by column rather than as a dict per element.
+
+    Every data field ("id", "label", "parent", "source", ...) is a list with an
+    entry per element, None where the element does not have the field, and the
+    classes and positions are columns too. Element dicts are only built (see
+    element and elements) for the elements that are sent to the browser.
+
+    Args:
+        data (dict[str, list]): Data field -> its value for every element.
+        classes (list[Optional[str]]): The classes of every element.
+        positions (np.ndarray): The (x, y) position of every element, one row per
+            element, NaN for elements without a position.
+    """
+
+    def __init__(self, data: dict[str, list], classes: list, positions: np.ndarray):
+        self.data = data
+        self.classes = classes
+        self.positions = positions
+
+    @classmethod
+    def from_elements(cls, elements: list[dict]) -> "ElementStore":
+        """Store element dicts, e.g. as written in elements.py, by column."""
+        data = {}
+        positions = np.full((len(elements), 2), np.nan)
+        for i, element in enumerate(elements):
+            for key, value in element["data"].items():
+                if key not in data:
+                    data[key] = [None] * len(elements)
+                data[key][i] = value
+            position = element.get("position")
+            if position is not None:
+                positions[i] = position["x"], position["y"]
+        return cls(data, [element.get("classes") for element in elements], positions)
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def column(self, key: str) -> list:
+        """Get a data field of every element (all None if no element has it)."""
+        return self.data.get(key) or [None] * len(self)
+
+    def element(self, i: int) -> dict:
+        """Build the cytoscape element dict at a position."""
+        return self.elements([i])[0]
+
+    def elements(self, positions) -> list[dict]:
+        """Build the cytoscape element dicts at some positions, in that order."""
+        positions = np.asarray(positions, dtype=np.int64)
+        columns = list(self.data.items())
+        classes = self.classes
+        result = []
+        for i, (x, y) in zip(positions.tolist(), self.positions[positions].tolist()):
+            data = {}
+            for key, column in columns:
+                if column[i] is not None:
+                    data[key] = column[i]
+            element = {"data": data}
+            # NaN marks elements without a position, such as edges
+            if not math.isnan(x):
+                element["position"] = {"x": x, "y": y}
+            if classes[i] is not None:
+                element["classes"] = classes[i]
+            result.append(element)
+        return result
+
+
+class ProjectGraph:
+    """Indexed, columnar view of a project's cytoscape elements.
+
+    The elements are kept in an ElementStore, and the indexes (id -> node, parent
+    -> children, and the edges leaving and entering every node as NumPy arrays)
+    are built once, so that filters and status propagation can look elements up
+    directly instead of scanning them. Selections are arrays of element positions,
+    and only the selected elements are built as dicts.
+
+    Args:
+        elements (Union[list[dict], ElementStore]): The elements, as a store or as
+            cytoscape node and edge dicts (as written in elements.py), which are
+            not kept.
+    """
+
+    def __init__(self, elements: Union[list[dict], ElementStore]):
+        if not isinstance(elements, ElementStore):
+            elements = ElementStore.from_elements(elements)
+        self.store = elements
+        count = len(elements)
+        ids = elements.column("id")
+        sources = elements.column("source")
+        targets = elements.column("target")
+        parents = elements.column("parent")
+
+        # node id -> position
+        self.index = {
+            node_id: i
+            for i, (node_id, source) in enumerate(zip(ids, sources))
+            if source is None
+        }
+        # parent id -> ids of child nodes
+        self.children = defaultdict(list)
+        for node_id, i in self.index.items():
+            if parents[i] is not None:
+                self.children[parents[i]].append(node_id)
+
+        # positions of the parent of every node, and the source and target of every
+        # edge; -1 where there is none, or it is not a node of the graph
+        def positions_of(column):
+            return np.fromiter(
+                (self.index.get(node_id, -1) for node_id in column),
+                dtype=np.int64,
+                count=count,
+            )
+
+        self.parent_positions = positions_of(parents)
+        self.is_edge = np.fromiter(
+            (source is not None for source in sources), dtype=bool, count=count
+        )
+        self.sources = positions_of(sources)
+        self.targets = positions_of(targets)
+        # edges leaving and entering every node, in compressed sparse row form: the
+        # edges of node i are edges[bounds[i]:bounds[i + 1]]
+        edges = np.flatnonzero(self.is_edge)
+        self._out = _csr(self.sources[edges], edges, count)
+        self._in = _csr(self.targets[edges], edges, count)
+        self._edge_classes = frozenset(elements.classes[i] for i in edges.tolist())
+
+        # the graph never changes, so selections can be kept for as long as the
+        # graph (a new snapshot brings a new graph and an empty cache)
+        self._selection_positions = lru_cache(maxsize=SELECTION_CACHE_SIZE)(
+            self._loe_selection_positions
+        )
+        self._positions = None
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def value(self, i: int, key: str):
+        """Get a data field of the element at a position, or None."""
+        column = self.store.data.get(key)
+        return None if column is None else column[i]
+
+    def edge_class(self, i: int) -> Optional[str]:
+        """Get the classes of the element at a position."""
+        return self.store.classes[i]
+
+    def node(self, node_id: str) -> dict:
+        """Build the element dict of a node.
+
+        Args:
+            node_id (str): The ID of the node.
+
+        Returns:
+            dict: The cytoscape element of the node. It is a new dict, so changing
+                it does not change the graph.
+        """
+        return self.store.element(self.index[node_id])
+
+    def parent(self, node_id: str) -> Optional[str]:
+        """Get the ID of the compound parent (LOE) of a node, if any."""
+        return self.value(self.index[node_id], "parent")
+
+    def out_edges(self, node_id: str) -> list[int]:
+        """Get the positions of the edges leaving a node."""
+        return _slice(self._out, self.index.get(node_id))
+
+    def in_edges(self, node_id: str) -> list[int]:
+        """Get the positions of the edges entering a node."""
+        return _slice(self._in, self.index.get(node_id))
+
+    def incident_edges(self, node_id: str) -> list[int]:
+        """Get the positions of all edges that start or end at a node."""
+        return self.out_edges(node_id) + self.in_edges(node_id)
+
+    def gather(self, positions=None) -> list[dict]:
+        """Build the elements at the given positions (all of them if not given), in
+        their original order."""
+        if positions is None:
+            return self.store.elements(np.arange(len(self)))
+        return self.store.elements(np.sort(np.asarray(positions, dtype=np.int64)))
+
+    def neighborhood(self, node_ids) -> np.ndarray:
+        """Get the elements needed to draw a set of nodes and their direct neighbors.
+
+        This is the selected nodes, every edge touching them, the nodes on the other
+        end of those edges, and the parent LOEs of all of those nodes (cytoscape needs
+        the parent to be present to draw a child).
+
+        Args:
+            node_ids (Iterable[str]): The IDs of the selected nodes. Unknown IDs are
+                ignored.
+
+        Returns:
+            np.ndarray: The sorted positions of the selected elements.
+        """
+        nodes = np.fromiter(
+            (self.index[node_id] for node_id in node_ids if node_id in self.index),
+            dtype=np.int64,
+        )
+        return self._neighborhood(nodes)
+
+    def _neighborhood(self, nodes: np.ndarray) -> np.ndarray:
+        """neighborhood, of node positions."""
+        edges = np.concatenate([_gather(self._out, nodes), _gather(self._in, nodes)])
+        reached = np.concatenate([nodes, self.sources[edges], self.targets[edges]])
+        reached = reached[reached >= 0]
+        parents = self.parent_positions[reached]
+        return np.unique(np.concatenate([reached, parents[parents >= 0], edges]))
+
+    def neighborhood_elements(self, node_ids) -> list[dict]:
+        """Get the elements needed to draw a set of nodes and their direct neighbors
+        (see neighborhood), nodes before edges."""
+        return self.store.elements(self.neighborhood(node_ids))
+
+    def neighbors(self, node_id: str, direction: str = "both", classes=None):
+        """Get the edges of a node that a query follows, with the nodes they lead to.
+
+        An edge's source depends on its target, so upstream goes from a node to its
+        dependencies and downstream from a node to its dependents. Symmetric edges
+        (see SYMMETRIC_CLASSES) are followed in either direction.
+
+        Args:
+            node_id (str): The ID of the node.
+            direction (str): One of DIRECTIONS.
+            classes (Optional[Collection[str]]): The edge classes to follow, or None
+                for all of them.
+
+        Yields:
+            tuple[int, str]: The position of the edge and the ID of the other node.
+        """
+        edge_classes = self.store.classes
+        for positions, end, skipped in (
+            (self.out_edges(node_id), self.store.column("target"), "downstream"),
+            (self.in_edges(node_id), self.store.column("source"), "upstream"),
+        ):
+            for i in positions:
+                edge_class = edge_classes[i]
+                if classes is not None and edge_class not in classes:
+                    continue
+                if direction == skipped and edge_class not in SYMMETRIC_CLASSES:
+                    continue
+                yield i, end[i]
+
+    def query(
+        self,
+        node_ids,
+        hops: int = 1,
+        direction: str = "both",
+        classes=None,
+        max_nodes: Optional[int] = None,
+    ) -> np.ndarray:
+        """Get the elements needed to draw the nodes within some hops of a selection.
+
+        Runs a breadth-first search from the selected nodes that stops after the
+        given number of hops, once no new nodes are found, or once max_nodes nodes
+        have been reached. The result holds the nodes reached, the edges followed
+        between them, and the parent LOEs of those nodes. With the default options
+        this is the same as neighborhood, which is used directly.
+
+        Args:
+            node_ids (Iterable[str]): The IDs of the selected nodes. Unknown IDs are
+                ignored.
+            hops (int): The greatest number of edges between a selected node and a
+                node reached from it.
+            direction (str): One of DIRECTIONS (see neighbors).
+            classes (Optional[Collection[str]]): The edge classes to follow, or None
+                for all of them.
+            max_nodes (Optional[int]): Stop reaching new nodes past this many (the
+                selected nodes always count), or None for no limit.
+
+        Returns:
+            np.ndarray: The sorted positions of the selected elements.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f'Unknown direction "{direction}"')
+        # following every class of edge in the graph is the same as following all
+        if classes is not None and self._edge_classes <= set(classes):
+            classes = None
+        if hops == 1 and direction == "both" and classes is None and max_nodes is None:
+            return self.neighborhood(node_ids)
+
+        reached = [node_id for node_id in node_ids if node_id in self.index]
+        visited = set(reached)
+        edges = []
+        frontier = reached
+        for _ in range(hops):
+            next_frontier = []
+            for node_id in frontier:
+                for i, other_id in self.neighbors(node_id, direction, classes):
+                    if other_id not in self.index:
+                        continue
+                    if other_id not in visited:
+                        if max_nodes is not None and len(visited) >= max_nodes:
+                            continue
+                        visited.add(other_id)
+                        next_frontier.append(other_id)
+                    edges.append(i)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        nodes = np.fromiter((self.index[node_id] for node_id in visited), np.int64)
+        parents = self.parent_positions[nodes]
+        return np.unique(
+            np.concatenate([nodes, parents[parents >= 0], np.array(edges, np.int64)])
+        )
+
+    def query_elements(self, node_ids, **options) -> list[dict]:
+        """Get the elements selected by a query (see query), nodes before edges."""
+        return self.store.elements(self.query(node_ids, **options))
+
+    def layout(self) -> dict[str, dict]:
+        """Compute the positions of all nodes and store them with the elements.
+
+        The positions come from layered_positions and are computed only once per
+        graph; filtered views are built from the same store, so they can be drawn
+        with cytoscape's "preset" layout instead of a layout run in the browser.
+
+        Returns:
+            dict[str, dict]: Node id -> cytoscape position ({"x": ..., "y": ...}).
+        """
+        if self._positions is None:
+            positions = layered_positions(self)
+            for node_id, position in positions.items():
+                self.store.positions[self.index[node_id]] = (
+                    position["x"],
+                    position["y"],
+                )
+            self._positions = positions
+        return self._positions
+
+    def loe_positions(self, loe_ids) -> np.ndarray:
+        """Get the elements needed to draw a set of LOEs.
+
+        This is the LOE nodes, the nodes inside them and everything those nodes are
+        directly connected to (see neighborhood). The positions are cached by the
+        set of selected LOEs.
+
+        Args:
+            loe_ids (Iterable[str]): The IDs of the selected LOEs.
+
+        Returns:
+            np.ndarray: The sorted positions of the selected elements.
+        """
+        return self._selection_positions(
+            frozenset(loe_id for loe_id in loe_ids if loe_id in self.index)
+        )
+
+    def loe_elements(self, loe_ids) -> list[dict]:
+        """Get the elements needed to draw a set of LOEs (see loe_positions), nodes
+        before edges. The element dicts are built anew on every call."""
+        return self.store.elements(self.loe_positions(loe_ids))
+
+    def _loe_selection_positions(self, loe_ids: frozenset) -> np.ndarray:
+        loes = np.fromiter((self.index[loe_id] for loe_id in loe_ids), np.int64)
+        # LOEs without children are drawn on their own
+        children = np.flatnonzero(np.isin(self.parent_positions, loes))
+        return np.union1d(self._neighborhood(children), loes)
+
+
+def _csr(keys: np.ndarray, values: np.ndarray, count: int) -> tuple:
+    """Group values by their keys in range(count), dropping negative keys.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (bounds, values), the values of key i being
+            values[bounds[i]:bounds[i + 1]], in their original order.
+    """
+    keep = keys >= 0
+    keys, values = keys[keep], values[keep]
+    order = np.argsort(keys, kind="stable")
+    return np.searchsorted(keys[order], np.arange(count + 1)), values[order]
+
+
+def _slice(csr: tuple, key: Optional[int]) -> list[int]:
+    """Get the values of one key of a _csr grouping, as a list."""
+    if key is None:
+        return []
+    bounds, values = csr
+    return values[bounds[key] : bounds[key + 1]].tolist()
+
+
+def _gather(csr: tuple, keys: np.ndarray) -> np.ndarray:
+    """Get the values of several keys of a _csr grouping, concatenated."""
+    bounds, values = csr
+    lengths = bounds[keys + 1] - bounds[keys]
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return values[np.repeat(bounds[keys], lengths) + offsets]
+
+
+def layered_positions(graph: ProjectGraph) -> dict[str, dict]:
+    """Lay the nodes of a graph out in rows, with each LOE in its own block.
+
+    Rows (ranks) follow the dependency edges top to bottom, like the dagre layout:
+    every node sits above the nodes it depends on, and nodes in a dependency cycle
+    share a row. Symmetric edges do not affect the rows. Ranks are shared by the
+    whole graph, so dependencies between LOEs still point downwards. Each LOE's
+    children are placed side by side within its block, ordered within a row by the
+    average position of their neighbors in the rows above to reduce crossings. LOEs
+    without children, and nodes without a parent, get blocks of their own.
+
+    Args:
+        graph (ProjectGraph): The graph to lay out.
+
+    Returns:
+        dict[str, dict]: Node id -> cytoscape position ({"x": ..., "y": ...}).
+    """
+    parents = set(graph.children)
+
+    def successors(node_id):
+        return [
+            other_id
+            for i, other_id in graph.neighbors(node_id, "upstream")
+            if graph.edge_class(i) not in SYMMETRIC_CLASSES
+            and other_id in graph.index
+            and other_id not in parents
+        ]
+
+    # nodes that are drawn as nodes rather than as boxes around their children
+    leaves = [node_id for node_id in graph.index if node_id not in parents]
+    # components come out dependencies first, so walk them in reverse
+    components = strongly_connected_components(leaves, successors)
+    component_of = {
+        node_id: number
+        for number, members in enumerate(components)
+        for node_id in members
+    }
+    component_rank = [0] * len(components)
+    for number in reversed(range(len(components))):
+        for node_id in components[number]:
+            for other_id in successors(node_id):
+                other = component_of[other_id]
+                if other != number:
+                    component_rank[other] = max(
+                        component_rank[other], component_rank[number] + 1
+                    )
+    rank = {node_id: component_rank[component_of[node_id]] for node_id in leaves}
+
+    # block id -> rank -> node ids, blocks and nodes in their original order
+    blocks = {}
+    for node_id in leaves:
+        parent = graph.parent(node_id)
+        block = parent if parent in graph.index else node_id
+        blocks.setdefault(block, {}).setdefault(rank[node_id], []).append(node_id)
+
+    positions = {}
+    # x of every placed node, for ordering the rows below it
+    placed = {}
+    left = 0
+    for block, rows in blocks.items():
+        width = max(len(row) for row in rows.values())
+        for row_rank in sorted(rows):
+            row = rows[row_rank]
+
+            def barycenter(node_id):
+                xs = [
+                    placed[other_id]
+                    for _, other_id in graph.neighbors(node_id)
+                    if other_id in placed and rank[other_id] < row_rank
+                ]
+                return sum(xs) / len(xs) if xs else float("inf")
+
+            # sorting is stable, so nodes without placed neighbors keep their order
+            row.sort(key=barycenter)
+            # center shorter rows in the block
+            offset = left + (width - len(row)) * NODE_SPACING / 2
+            for column, node_id in enumerate(row):
+                x = offset + column * NODE_SPACING
+                placed[node_id] = x
+                positions[node_id] = {"x": x, "y": row_rank * RANK_SPACING}
+        left += width * NODE_SPACING + BLOCK_SPACING
+
+    return positions
+
+
+def strongly_connected_components(vertices, successors) -> list[list]:
+    """Find the strongly connected components reachable from a set of vertices.
+
+    Uses an iterative version of Tarjan's algorithm, so deep graphs do not hit the
+    recursion limit. Runs in time linear in the vertices and edges visited.
+
+    Args:
+        vertices (Iterable): The vertices to start searching from.
+        successors (Callable): Gets the vertices that a vertex has edges to.
+
+    Returns:
+        list[list]: The components, in reverse topological order: every component
+            comes after all components that it has edges to.
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    def visit(vertex):
+        index[vertex] = lowlink[vertex] = len(index)
+        stack.append(vertex)
+        on_stack.add(vertex)
+        return vertex, iter(successors(vertex))
+
+    for root in vertices:
+        if root in index:
+            continue
+        work = [visit(root)]
+        while work:
+            vertex, remaining = work[-1]
+            for successor in remaining:
+                if successor not in index:
+                    work.append(visit(successor))
+                    break
+                if successor in on_stack:
+                    lowlink[vertex] = min(lowlink[vertex], index[successor])
+            else:
+                # all successors done, so the vertex's lowlink is final
+                work.pop()
+                if work:
+                    caller = work[-1][0]
+                    lowlink[caller] = min(lowlink[caller], lowlink[vertex])
+                if lowlink[vertex] == index[vertex]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == vertex:
+                            break
+                    components.append(component)
+
+    return components
@@ -0,0 +1,142 @@
+# PROJECT REGISTRY
+
+import glob
+import logging
+import os
+import threading
+import typing
+from collections import OrderedDict
+
+if typing.TYPE_CHECKING:
+    from snapshot import Watcher
+
+# the project shown at the root URL, if there is a workbook for it
+DEFAULT_PROJECT = "project_state"
+
+
+class ProjectRegistry:
+    """The project workbooks in a directory, loaded on first use.
+
+    Every workbook (*.xlsx) in the directory is a project, named after the file
+    without its extension. A project is loaded the first time it is requested and
+    then watched for changes like a single workbook is. At most max_loaded projects
+    are kept in memory; requesting another one stops watching and drops the least
+    recently used.
+
+    Args:
+        directory (str): The directory holding the workbooks.
+        max_loaded (int): The largest number of projects kept in memory.
+        snapshot_dir (Optional[str]): If given, projects are not loaded from their
+            workbooks but followed from the snapshots that serve.py publishes in
+            a subdirectory per project (see SnapshotFollower).
+        update_cells (bool): Whether changed statuses are written into the existing
+            workbooks cell by cell, rather than rewriting their sheet (see load_data).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_loaded: int = 8,
+        snapshot_dir: typing.Optional[str] = None,
+        update_cells: bool = False,
+    ):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.snapshot_dir = snapshot_dir
+        self.update_cells = update_cells
+        # project name -> watcher, least recently used first
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        # project name -> (lock held while loading it, so it is loaded only once,
+        # number of requests holding or waiting for the lock)
+        self._loading = {}
+
+    def names(self) -> list[str]:
+        """Get the names of all projects, sorted."""
+        # glob skips dotfiles, such as the temporary workbooks write_statuses renames
+        # over a project; also skip the lock files Excel creates next to open ones
+        return sorted(
+            os.path.splitext(os.path.basename(path))[0]
+            for path in glob.glob(os.path.join(self.directory, "*.xlsx"))
+            if not os.path.basename(path).startswith("~$")
+        )
+
+    def path(self, name: str) -> str:
+        """Get the path to the workbook of a project."""
+        return os.path.join(self.directory, name + ".xlsx")
+
+    def loaded(self, name: str) -> typing.Optional["Watcher"]:
+        """Get the watcher of a project if it is loaded, without loading it.
+
+        Args:
+            name (str): The name of the project.
+
+        Returns:
+            typing.Optional[Watcher]: The project's watcher, or None if the project
+                is not loaded (or was unloaded to make room for others).
+        """
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+            return self._loaded.get(name)
+
+    def get(self, name: str) -> typing.Optional["Watcher"]:
+        """Get the watcher holding the current snapshot of a project, loading the
+        project if it is not loaded yet.
+
+        Args:
+            name (str): The name of the project.
+
+        Returns:
+            typing.Optional[Watcher]: The project's watcher, already running, or
+                None if there is no such project or it could not be loaded.
+        """
+        watcher = self.loaded(name)
+        if watcher is not None:
+            return watcher
+        # checked first, so unknown names do not leave a lock behind
+        if name not in self.names():
+            return None
+        with self._lock:
+            loading, waiting = self._loading.get(name, (threading.Lock(), 0))
+            self._loading[name] = (loading, waiting + 1)
+        try:
+            with loading:
+                return self._load(name)
+        finally:
+            # the lock is dropped once no request waits on it
+            with self._lock:
+                loading, waiting = self._loading.pop(name)
+                if waiting > 1:
+                    self._loading[name] = (loading, waiting - 1)
+
+    def _load(self, name: str) -> typing.Optional["Watcher"]:
+        """Load a project, with its loading lock held."""
+        # another request may have loaded it while this one waited
+        watcher = self.loaded(name)
+        if watcher is not None:
+            return watcher
+        try:
+            watcher = self.open(name)
+        except (SystemExit, Exception):
+            # load_data exits on invalid data, which only fails this project
+            logging.error(f'Could not load project "{name}"')
+            return None
+        watcher.ensure_running()
+
+        with self._lock:
+            self._loaded[name] = watcher
+            while len(self._loaded) > self.max_loaded:
+                evicted_name, evicted = self._loaded.popitem(last=False)
+                evicted.stop()
+                logging.info(f'Unloaded project "{evicted_name}"')
+        return watcher
+
+    def open(self, name: str) -> "Watcher":
+        """Load a project, from its workbook or from the published snapshots."""
+        # imported on first use, so the app starts without pandas and plotly
+        from snapshot import SnapshotFollower, WorkbookWatcher
+
+        if self.snapshot_dir is not None:
+            return SnapshotFollower(os.path.join(self.snapshot_dir, name), timeout=10)
+        return WorkbookWatcher(self.path(name), update_cells=self.update_cells)
@@ -0,0 +1,145 @@
+# CRITICAL PATH
+
+import numpy as np
+import pandas as pd
+
+import data_loading
+
+# tasks with at most this much slack are critical, to allow for rounding
+CRITICAL_SLACK = pd.Timedelta(0)
+
+
+def critical_path(project_data: pd.DataFrame) -> pd.DataFrame:
+    """Compute the critical path method (CPM) schedule of the project's tasks.
+
+    Every dependency is finish-to-start. A task starts at its planned start date or
+    once all of its dependencies are finished, whichever is later, and takes as long
+    as it is planned to. The latest dates are how late each task can start and
+    finish without moving the finish date of the project (its last task), and slack
+    is the difference. Tasks without slack form the critical path.
+
+    LOEs are summaries of their objectives rather than tasks, so they are left out
+    and their columns are empty (NaT, and not critical), as are tasks on a
+    circular dependency, which has no schedule.
+
+    Both passes go over the tasks a topological level at a time, with NumPy arrays
+    for the dates and the dependencies, so the work done in Python grows with the
+    length of the longest chain of dependencies rather than with the number of tasks.
+
+    Args:
+        project_data (pd.DataFrame): The validated and processed project data.
+
+    Returns:
+        pd.DataFrame: The schedule, indexed like project_data, with columns
+            "Earliest Start", "Earliest Finish", "Latest Start", "Latest Finish",
+            "Slack" and "Critical".
+    """
+    ids = project_data["ID"].to_numpy()
+    count = len(ids)
+    is_task = ~project_data["ID"].str.startswith("LOE").to_numpy(dtype=bool)
+    # dates as int64 nanoseconds, so the passes are integer arithmetic
+    start = project_data["Start Date"].to_numpy(dtype="datetime64[ns]").view("i8")
+    end = project_data["End Date"].to_numpy(dtype="datetime64[ns]").view("i8")
+    duration = end - start
+
+    # dependencies between tasks, as positions: dependent -> dependency
+    edges = data_loading.dependency_edges(project_data)
+    position = pd.Series(np.arange(count), index=ids)
+    dependent = project_data.index.get_indexer(edges.index)
+    dependency = position.reindex(edges["Dependency"].to_numpy()).to_numpy()
+    keep = ~np.isnan(dependency)
+    dependent = dependent[keep]
+    dependency = dependency[keep].astype(np.int64)
+    keep = is_task[dependent] & is_task[dependency]
+    dependent, dependency = dependent[keep], dependency[keep]
+
+    level = topological_levels(count, dependent, dependency)
+    scheduled = is_task & (level >= 0)
+    keep = scheduled[dependent] & scheduled[dependency]
+    dependent, dependency = dependent[keep], dependency[keep]
+    depth = level.max() + 1 if scheduled.any() else 0
+
+    # forward pass: a level's dependencies are all on earlier levels, so they are
+    # finished by the time the level is reached
+    earliest_start = start.copy()
+    earliest_finish = end.copy()
+    nodes = np.flatnonzero(scheduled)
+    nodes_by_level = _group(nodes, level[nodes], depth)
+    edges_by_level = _group(np.arange(len(dependent)), level[dependent], depth)
+    for nodes, at in zip(nodes_by_level, edges_by_level):
+        np.maximum.at(earliest_start, dependent[at], earliest_finish[dependency[at]])
+        earliest_finish[nodes] = earliest_start[nodes] + duration[nodes]
+
+    # backward pass: a level's dependents are all on later levels
+    finish = earliest_finish[scheduled].max() if depth else 0
+    latest_finish = np.full(count, finish, dtype=np.int64)
+    latest_start = latest_finish - duration
+    edges_by_level = _group(np.arange(len(dependency)), level[dependency], depth)
+    for nodes, at in zip(reversed(nodes_by_level), reversed(edges_by_level)):
+        np.minimum.at(latest_finish, dependency[at], latest_start[dependent[at]])
+        latest_start[nodes] = latest_finish[nodes] - duration[nodes]
+
+    def dates(values):
+        return pd.to_datetime(
+            pd.Series(values, index=project_data.index).where(scheduled)
+        )
+
+    result = pd.DataFrame(
+        {
+            "Earliest Start": dates(earliest_start),
+            "Earliest Finish": dates(earliest_finish),
+            "Latest Start": dates(latest_start),
+            "Latest Finish": dates(latest_finish),
+        }
+    )
+    result["Slack"] = result["Latest Start"] - result["Earliest Start"]
+    result["Critical"] = (result["Slack"] <= CRITICAL_SLACK).to_numpy() & scheduled
+    return result
+
+
+def topological_levels(
+    count: int, dependent: np.ndarray, dependency: np.ndarray
+) -> np.ndarray:
+    """Get the topological level of every task.
+
+    Tasks without dependencies are on level 0, and every other task is one level
+    past its latest dependency. This is Kahn's algorithm, taking a whole level at a
+    time.
+
+    Args:
+        count (int): The number of tasks.
+        dependent (np.ndarray): Position of the dependent task of every dependency.
+        dependency (np.ndarray): Position of the task it depends on.
+
+    Returns:
+        np.ndarray: The level of every task, or -1 for tasks on or after a cycle.
+    """
+    level = np.full(count, -1, dtype=np.int64)
+    remaining = np.bincount(dependent, minlength=count)
+    # dependencies ordered by the task depended on, so a task's dependents are a slice
+    order = np.argsort(dependency, kind="stable")
+    dependents = dependent[order]
+    bounds = np.searchsorted(dependency[order], np.arange(count + 1))
+
+    current = np.flatnonzero(remaining == 0)
+    depth = 0
+    while len(current):
+        level[current] = depth
+        # the dependents of every task on this level, with repeats
+        lengths = bounds[current + 1] - bounds[current]
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        reached = dependents[np.repeat(bounds[current], lengths) + offsets]
+        np.subtract.at(remaining, reached, 1)
+        reached = np.unique(reached)
+        current = reached[remaining[reached] == 0]
+        depth += 1
+    return level
+
+
+def _group(items: np.ndarray, keys: np.ndarray, count: int) -> list[np.ndarray]:
+    """Split items by their keys, which are in range(count)."""
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(keys[order], np.arange(count + 1))
+    return [items[order[bounds[i] : bounds[i + 1]]] for i in range(count)]
@@ -0,0 +1,124 @@
+# PRODUCTION SERVING WITH SEVERAL WORKER PROCESSES
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from projects import ProjectRegistry
+from snapshot import WorkbookWatcher
+
+# where the loader publishes snapshots, in a subdirectory per project
+SNAPSHOT_DIR = ".loeviz_snapshots"
+# seconds between checks for new project workbooks
+SCAN_INTERVAL = 10.0
+
+
+def load_projects(registry: ProjectRegistry, directory: str, stopped: threading.Event):
+    """Load every project, and projects added later, publishing their snapshots.
+
+    Args:
+        registry (ProjectRegistry): The projects to load.
+        directory (str): The directory to publish to.
+        stopped (threading.Event): Set to stop looking for new projects.
+    """
+    watchers = {}
+    # project name -> modification time of a workbook that failed to load
+    failed = {}
+    while True:
+        for name in registry.names():
+            if name in watchers:
+                continue
+            mtime = None
+            try:
+                mtime = os.stat(registry.path(name)).st_mtime
+                if failed.get(name) == mtime:
+                    continue
+                watchers[name] = WorkbookWatcher(
+                    registry.path(name),
+                    publish_dir=os.path.join(directory, name),
+                    update_cells=registry.update_cells,
+                )
+            except FileNotFoundError:
+                # removed or renamed since the scan; picked up again if it returns
+                continue
+            except (SystemExit, Exception):
+                # load_data exits on invalid data; retried once the file changes
+                logging.error(f'Could not load project "{name}", skipping it')
+                failed[name] = mtime
+                continue
+            watchers[name].ensure_running()
+            logging.info(f'Publishing snapshots of "{name}" to "{directory}"')
+        if stopped.wait(SCAN_INTERVAL):
+            return
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Load the project workbooks in this process and serve the app "
+        "from several gunicorn worker processes that share their data."
+    )
+    parser.add_argument(
+        "--projects-dir", default=".", help="folder of the project workbooks"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="number of worker processes; 0 only runs the loader, for workers "
+        "started separately with LOEVIZ_SNAPSHOT_DIR set (default: 4)",
+    )
+    parser.add_argument("--bind", default="127.0.0.1:1000")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    directory = os.path.abspath(args.snapshot_dir)
+    # the only process that reads the workbooks and writes statuses back to them
+    registry = ProjectRegistry(
+        args.projects_dir, update_cells=os.environ.get("LOEVIZ_UPDATE_CELLS") == "1"
+    )
+    stopped = threading.Event()
+    loader = threading.Thread(
+        target=load_projects, args=(registry, directory, stopped), daemon=True
+    )
+    loader.start()
+
+    if args.workers == 0:
+        try:
+            loader.join()
+        except KeyboardInterrupt:
+            stopped.set()
+        return 0
+
+    workers = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers",
+            str(args.workers),
+            "--bind",
+            args.bind,
+            "app:server",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={
+            **os.environ,
+            "LOEVIZ_PROJECTS_DIR": os.path.abspath(args.projects_dir),
+            "LOEVIZ_SNAPSHOT_DIR": directory,
+        },
+    )
+    try:
+        return workers.wait()
+    except KeyboardInterrupt:
+        workers.terminate()
+        return workers.wait()
+    finally:
+        stopped.set()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# SNAPSHOTS SHARED BETWEEN PROCESSES
+
+import json
+import logging
+import os
+import tempfile
+import typing
+
+import pandas as pd
+
+try:
+    import pyarrow.feather
+    import pyarrow.types
+except ImportError:
+    pyarrow = None
+
+# the file naming the current snapshot; replaced atomically on every publish
+POINTER = "current.json"
+# published snapshot files kept besides the current one, for workers still reading
+KEEP = 2
+
+
+def publish(directory: str, project_data: pd.DataFrame, version: int) -> str:
+    """Publish a version of the project data for worker processes.
+
+    The data is written to a new file in the directory, as uncompressed Arrow IPC
+    (Feather) when pyarrow is installed, which workers can map without copying it
+    (see attach), and pickle otherwise. Then the pointer file is replaced to name
+    it, so a worker sees either the old or the new version, never a partly written
+    one.
+
+    Args:
+        directory (str): The directory shared with the workers.
+        project_data (pd.DataFrame): The validated and processed project data.
+        version (int): The version of the data.
+
+    Returns:
+        str: The name of the published file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    # the process id keeps names unique when the loader is restarted
+    name = f"snapshot-{os.getpid()}-{version}"
+    data = project_data.reset_index(drop=True)
+    if pyarrow is not None:
+        try:
+            _write_atomic(
+                directory,
+                name + ".arrow",
+                lambda path: data.to_feather(path, compression="uncompressed"),
+            )
+            name += ".arrow"
+        except Exception:
+            pass
+    if not name.endswith(".arrow"):
+        name += ".pkl"
+        _write_atomic(directory, name, data.to_pickle)
+
+    def write_pointer(path):
+        with open(path, "w") as f:
+            json.dump({"version": version, "file": name}, f)
+
+    _write_atomic(directory, POINTER, write_pointer)
+    prune(directory, name)
+    return name
+
+
+def _write_atomic(directory: str, name: str, write: typing.Callable[[str], None]):
+    """Write a file through a temporary file that is renamed into place."""
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, os.path.join(directory, name))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def current(directory: str) -> typing.Optional[dict]:
+    """Get the pointer to the current snapshot, or None if none is published yet.
+
+    Returns:
+        typing.Optional[dict]: The "version" and the "file" name of the snapshot.
+    """
+    try:
+        with open(os.path.join(directory, POINTER)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def attach(directory: str, pointer: dict) -> pd.DataFrame:
+    """Read a published snapshot.
+
+    Arrow snapshots are memory-mapped and not copied: text columns stay in Arrow
+    memory (as pandas' pyarrow-backed string dtype) and date columns are views of
+    the file, so the operating system shares the data between all workers instead
+    of each holding its own copy. Each worker still builds the elements, layout and
+    schedule from it itself.
+
+    Args:
+        directory (str): The directory shared with the loader.
+        pointer (dict): The pointer to the snapshot, as returned by current.
+
+    Returns:
+        pd.DataFrame: The project data.
+    """
+    path = os.path.join(directory, pointer["file"])
+    if path.endswith(".arrow"):
+        return pyarrow.feather.read_table(path, memory_map=True).to_pandas(
+            types_mapper=_string_dtype, split_blocks=True
+        )
+    return pd.read_pickle(path)
+
+
+def _string_dtype(arrow_type) -> typing.Optional[pd.StringDtype]:
+    """Keep text columns in Arrow memory rather than converting them to objects."""
+    if pyarrow.types.is_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def prune(directory: str, keep: str):
+    """Remove published snapshot files past the KEEP most recent (besides keep)."""
+    entries = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("snapshot-") and name != keep
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[KEEP:]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            # on Windows, files still mapped by a worker cannot be removed yet
+            logging.debug(f'Could not remove old snapshot "{path}": {e}')
@@ -0,0 +1,260 @@
+# DATA SNAPSHOTS AND HOT RELOAD
+
+import abc
+import logging
+import os
+import threading
+import time
+import typing
+
+import pandas as pd
+
+import data_loading
+import metrics
+import shared
+from aggregate import Aggregation
+from cache import file_hash
+from elements import build_elements
+from graph import ProjectGraph
+from schedule import critical_path
+
+if typing.TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+class Snapshot:
+    """Everything the app derives from one version of the project workbook.
+
+    A snapshot is never modified once built, except that its timeline figure is
+    built on first use. Callbacks should read the current snapshot once and use
+    only that object, so that they always see data, elements and figure from the
+    same version of the workbook.
+
+    Args:
+        project_data (pd.DataFrame): The validated and processed project data.
+        version (int): Increases by one every time the workbook is reloaded.
+    """
+
+    def __init__(self, project_data: pd.DataFrame, version: int):
+        self.version = version
+        self.project_data = project_data
+        # elements are stored by column, and only the ones shown are built as dicts
+        with metrics.stage("build_elements"):
+            store = build_elements(project_data)
+        with metrics.stage("build_graph"):
+            self.graph = ProjectGraph(store)
+        ids_classes = list(zip(store.column("id"), store.classes))
+        self.loes_list = [node_id for node_id, kind in ids_classes if kind == "loe"]
+        self.nodes_list = [
+            node_id for node_id, kind in ids_classes if kind in ("obj", "io")
+        ]
+        # positions are computed here, once per version, so pages draw the elements
+        # with the "preset" layout instead of laying them out in the browser
+        with metrics.stage("layout"):
+            self.graph.layout()
+        # summary nodes for the less detailed views of large graphs
+        with metrics.stage("aggregate"):
+            self.aggregations = {
+                level: Aggregation(self.graph, level) for level in ("objective", "loe")
+            }
+        # critical path of the tasks, highlighted in the timeline
+        with metrics.stage("critical_path"):
+            self.schedule = critical_path(project_data)
+        # the timeline figure is only built once someone opens it (see timeline)
+        self._timeline = None
+        self._timeline_lock = threading.Lock()
+
+    def timeline(self) -> "go.Figure":
+        """Get the timeline figure, building it on first use.
+
+        Most visits never open the timeline, and the figure (and plotly itself) is
+        slow to build for large projects, so it is not built with the snapshot.
+
+        Returns:
+            go.Figure: The timeline figure of this version of the data.
+        """
+        with self._timeline_lock:
+            if self._timeline is None:
+                # plotly is only imported once a timeline is built
+                from timeline import build_timeline
+
+                with metrics.stage("build_timeline"):
+                    self._timeline = build_timeline(self.project_data, self.schedule)
+            return self._timeline
+
+
+class Watcher(threading.Thread, abc.ABC):
+    """Background thread that keeps a current snapshot, checking for a new one at a
+    fixed interval.
+
+    Subclasses set self.snapshot before the thread starts, and implement check.
+
+    Args:
+        name (str): The name of the thread.
+        interval (float): Seconds between checks.
+    """
+
+    snapshot: Snapshot
+
+    def __init__(self, name: str, interval: float):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def ensure_running(self):
+        """Start watching if not already started. Safe to call from any thread."""
+        with self._start_lock:
+            if self.ident is None:
+                self.start()
+
+    def stop(self):
+        """Stop watching; the current snapshot stays usable."""
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logging.exception(f"{self.name} failed to check for a new snapshot")
+
+    @abc.abstractmethod
+    def check(self) -> bool:
+        """Publish a new snapshot if there is one.
+
+        Returns:
+            bool: Whether a new snapshot was published.
+        """
+
+
+class WorkbookWatcher(Watcher):
+    """Background thread that reloads the workbook whenever it changes.
+
+    The file's modification time is polled, and the contents are hashed only when
+    it moves, so saves that do not change anything (or touch the file twice) do not
+    cause a reload. A workbook that fails to load or validate is logged and the
+    previous snapshot is kept.
+
+    When publishing for worker processes, the data is only published: the workers
+    build the elements, layout and schedule themselves, so this watcher builds no
+    snapshot and its snapshot stays None.
+
+    Args:
+        filename (str): The path to the workbook.
+        interval (float): Seconds between modification time checks.
+        publish_dir (Optional[str]): If given, every loaded version of the data is
+            published there for worker processes (see SnapshotFollower) instead of
+            being kept as a snapshot.
+        update_cells (bool): Whether changed statuses are written into the existing
+            workbook cell by cell, rather than rewriting the sheet (see load_data).
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        interval: float = 2.0,
+        publish_dir: typing.Optional[str] = None,
+        update_cells: bool = False,
+    ):
+        super().__init__("workbook-watcher", interval)
+        self.filename = filename
+        self.publish_dir = publish_dir
+        self.update_cells = update_cells
+        self.snapshot = None
+        self.version = 0
+        # statuses of the previous version, so reloads only reprocess changed tasks
+        self._statuses = data_loading.StatusIndex()
+        # the initial load happens up front so the app never runs without data
+        project_data = data_loading.load_data(
+            filename, update_cells=update_cells, statuses=self._statuses
+        )
+        self._update(project_data, self._snapshot(project_data))
+        self._mtime = os.stat(filename).st_mtime
+        self._hash = file_hash(filename)
+
+    def check(self) -> bool:
+        """Reload the workbook if it changed since it was last loaded.
+
+        Returns:
+            bool: Whether a new snapshot was published.
+        """
+        mtime = os.stat(self.filename).st_mtime
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        content_hash = file_hash(self.filename)
+        if content_hash == self._hash:
+            return False
+        self._hash = content_hash
+
+        try:
+            project_data = data_loading.load_data(
+                self.filename, update_cells=self.update_cells, statuses=self._statuses
+            )
+            snapshot = self._snapshot(project_data)
+        except (SystemExit, Exception):
+            # load_data exits on invalid data, which only ends this thread's attempt
+            logging.error(f'Could not reload "{self.filename}", keeping previous data')
+            return False
+
+        # load_data may write the processed statuses back, so remember the result of
+        # that write rather than triggering another reload on it
+        self._mtime = os.stat(self.filename).st_mtime
+        self._hash = file_hash(self.filename)
+        self._update(project_data, snapshot)
+        logging.info(f'Reloaded "{self.filename}" (version {self.version})')
+        return True
+
+    def _snapshot(self, project_data: pd.DataFrame) -> typing.Optional[Snapshot]:
+        """Build the snapshot of the next version, unless it is only published."""
+        if self.publish_dir is not None:
+            return None
+        return Snapshot(project_data, self.version + 1)
+
+    def _update(self, project_data: pd.DataFrame, snapshot: typing.Optional[Snapshot]):
+        """Make the next version of the data current, and publish it if requested."""
+        self.version += 1
+        # swapping the reference is atomic; callbacks holding the old snapshot
+        # finish with it undisturbed
+        if snapshot is not None:
+            self.snapshot = snapshot
+        if self.publish_dir is not None:
+            shared.publish(self.publish_dir, project_data, self.version)
+
+
+class SnapshotFollower(Watcher):
+    """Background thread that follows the snapshots published by a loader process.
+
+    Used by worker processes instead of WorkbookWatcher, so the workbook is only
+    loaded (and its statuses written back) by the loader, and every worker shows
+    the same version of the data. Only the small pointer file is read on every
+    check; a new version is attached when it names a different snapshot.
+
+    Args:
+        directory (str): The directory the loader publishes to.
+        interval (float): Seconds between checks of the pointer file.
+        timeout (float): Seconds to wait for the loader to publish the first
+            snapshot, when starting before it.
+    """
+
+    def __init__(self, directory: str, interval: float = 1.0, timeout: float = 60.0):
+        super().__init__("snapshot-follower", interval)
+        self.directory = directory
+        deadline = time.monotonic() + timeout
+        while (pointer := shared.current(directory)) is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'No snapshot was published in "{directory}"')
+            time.sleep(0.2)
+        self._file = pointer["file"]
+        self.snapshot = Snapshot(shared.attach(directory, pointer), pointer["version"])
+
+    def check(self) -> bool:
+        pointer = shared.current(self.directory)
+        if pointer is None or pointer["file"] == self._file:
+            return False
+        self._file = pointer["file"]
+        snapshot = Snapshot(shared.attach(self.directory, pointer), pointer["version"])
+        self.snapshot = snapshot
+        logging.info(f"Attached snapshot version {snapshot.version}")
+        return True
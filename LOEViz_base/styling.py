@@ -35,6 +35,20 @@ stylesheet = [
             "target-arrow-shape": "triangle",
         },
     },
+    # Summary nodes of collapsed LOEs and objectives larger, merged edges labeled
+    {
+        "selector": "node.aggregate",
+        "style": {
+            "width": 50,
+            "height": 50,
+            "border-width": 3,
+            "border-color": "black",
+        },
+    },
+    {
+        "selector": "edge.aggregate",
+        "style": {"label": "data(label)", "width": 3, "font-size": 10},
+    },
     # Attribute selectors
     # Status
     {"selector": '[status = "overdue"]', "style": {"background-color": "red"}},
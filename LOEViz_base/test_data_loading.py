@@ -0,0 +1,111 @@
+# TESTS OF STATUS PROCESSING
+
+import os
+import random
+import stat
+
+import pandas as pd
+import pytest
+
+import data_loading
+from data_loading import StatusIndex, process_statuses, write_statuses
+
+STATUSES = ["On Track", "At Risk", "Complete", "Overdue"]
+TODAY = pd.Timestamp("2024-06-01")
+
+
+def random_project(rng: random.Random, size: int) -> pd.DataFrame:
+    """Generate project data with random end dates, statuses and dependencies."""
+    ids = [f"O1.{i + 1}" for i in range(size)]
+    rows = []
+    for task_id in ids:
+        end = TODAY + pd.Timedelta(days=rng.randint(-20, 20))
+        dependencies = rng.sample(ids, rng.randint(0, 3))
+        rows.append(
+            {
+                "ID": task_id,
+                "Description": f"Task {task_id}",
+                "Start Date": end - pd.Timedelta(days=30),
+                "End Date": end,
+                "Status": rng.choice(STATUSES),
+                "Dependencies": ",".join(dependencies) or None,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def edit(rng: random.Random, df: pd.DataFrame) -> pd.DataFrame:
+    """Make a random change to project data, as a user editing the workbook would."""
+    df = df.copy()
+    change = rng.choice(["end", "status", "dependencies", "remove", "add", "reorder"])
+    rows = rng.sample(list(df.index), min(len(df), rng.randint(1, 5)))
+    ids = df["ID"].tolist()
+    if change == "end":
+        df.loc[rows, "End Date"] = TODAY + pd.Timedelta(days=rng.randint(-20, 20))
+    elif change == "status":
+        df.loc[rows, "Status"] = rng.choice(STATUSES)
+    elif change == "dependencies":
+        for row in rows:
+            df.at[row, "Dependencies"] = ",".join(rng.sample(ids, min(len(ids), 2)))
+    elif change == "remove" and len(df) > len(rows):
+        df = df.drop(index=rows)
+    elif change == "add":
+        # a new task, or now and then a second row with an existing ID
+        added = df.loc[rows[:1]].assign(
+            ID=rng.choice([f"O2.{rng.randint(1, 9)}", df["ID"].iloc[0]]),
+            Status=rng.choice(STATUSES),
+            Dependencies=",".join(rng.sample(ids, min(len(ids), 2))),
+        )
+        df = pd.concat([df, added])
+    elif change == "reorder":
+        df = df.sample(frac=1, random_state=rng.randint(0, 1000))
+    return df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_status_index_matches_process_statuses(seed):
+    """StatusIndex gives the same statuses as process_statuses over successive
+    edits and clock changes."""
+    rng = random.Random(seed)
+    index = StatusIndex()
+    df = random_project(rng, rng.randint(5, 40))
+    today = TODAY
+    for _ in range(15):
+        pd.testing.assert_frame_equal(
+            index.process(df, today), process_statuses(df, today)
+        )
+        if rng.random() < 0.3:
+            today += pd.Timedelta(days=rng.randint(1, 10))
+        df = edit(rng, df)
+
+
+@pytest.mark.parametrize("update_cells", [False, True])
+def test_write_statuses_keeps_permissions(tmp_path, update_cells):
+    """Writing statuses back keeps the workbook's file permissions."""
+    filename = str(tmp_path / "project.xlsx")
+    loaded = random_project(random.Random(0), 5)
+    loaded.to_excel(filename, sheet_name="LOEs, IOs, and Objectives", index=False)
+    os.chmod(filename, 0o644)
+    result = loaded.assign(Status="Complete")
+    result.loc[0, "Status"] = "Overdue"
+
+    assert write_statuses(filename, loaded, result, update_cells)
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+    assert pd.read_excel(filename)["Status"].tolist() == result["Status"].tolist()
+
+
+@pytest.mark.parametrize("peel_rounds", [0, 1, 100])
+def test_validate_integrity_finds_loops(monkeypatch, peel_rounds):
+    """Loops are reported the same however far peeling gets before the search."""
+    monkeypatch.setattr(data_loading, "PEEL_ROUNDS", peel_rounds)
+    df = pd.DataFrame(
+        {
+            "ID": ["LOE1", "O1.1", "O1.2", "O1.3", "IO1.1.1", "IO1.1.2"],
+            "Dependencies": ["O1.1", "O1.2", "O1.3", "O1.1", "IO1.1.1", "IO1.1.1"],
+        }
+    )
+    violations = data_loading.validate_integrity(df)
+    assert [(v.row, v.message) for v in violations] == [
+        (3, "Circular dependency O1.1 -> O1.2 -> O1.3 -> O1.1"),
+        (6, '"IO1.1.1" depends on itself'),
+    ]
@@ -0,0 +1,146 @@
+# GENERATE TIMELINE FIGURE
+
+import typing
+
+import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
+
+import data_loading
+from schedule import critical_path
+
+# outline of the bars, and color of the arrows, of the critical path
+CRITICAL_COLOR = "darkviolet"
+
+
+def build_timeline(
+    project_data: pd.DataFrame, schedule: typing.Optional[pd.DataFrame] = None
+) -> go.Figure:
+    """Create the Gantt chart of the project, with arrows for dependencies.
+
+    Tasks on the critical path are outlined, and the dependencies between them are
+    drawn in CRITICAL_COLOR. Hovering a bar shows the slack of its task.
+
+    Args:
+        project_data (pd.DataFrame): The validated and processed project data.
+        schedule (Optional[pd.DataFrame]): The critical path schedule of the data
+            (see schedule.critical_path), computed if not given.
+
+    Returns:
+        go.Figure: The timeline figure.
+    """
+    if schedule is None:
+        schedule = critical_path(project_data)
+    # whole days of slack, blank for LOEs
+    slack = schedule["Slack"] / pd.Timedelta(days=1)
+    fig = px.timeline(
+        data_frame=project_data.assign(
+            Slack=slack.map("{:g} days".format).where(slack.notna(), "")
+        ),
+        x_start="Start Date",
+        x_end="End Date",
+        y="ID",
+        color="Status",
+        color_discrete_map={
+            "Overdue": "red",
+            "At Risk": "yellow",
+            "On Track": "green",
+            "Complete": "blue",
+        },
+        hover_data=["Description", "Slack"],
+        height=500,
+    )
+    fig.add_shape(
+        type="line",
+        x0=pd.Timestamp.now(),
+        y0=-0.5,
+        x1=pd.Timestamp.now(),
+        y1=len(project_data) + 0.5,
+        line=dict(color="black", dash="dashdot", width=3),
+    )
+    fig.add_annotation(
+        x=pd.Timestamp.now(), y=len(project_data) + 1, text="Today", showarrow=False
+    )
+    fig.update_yaxes(autorange="reversed")
+    # outline the bars of critical tasks; px.timeline makes a trace per status
+    critical = set(project_data.loc[schedule["Critical"], "ID"])
+    for trace in fig.data:
+        trace.marker.line.color = CRITICAL_COLOR
+        trace.marker.line.width = [3 if task in critical else 0 for task in trace.y]
+
+    edges = data_loading.dependency_edges(project_data)
+    # dependencies that hold a critical task back: both ends critical, and the
+    # dependency finishes when the task can start at the earliest
+    finish = schedule["Earliest Finish"].set_axis(project_data["ID"])
+    driving = (
+        edges["ID"].isin(critical)
+        & edges["Dependency"].isin(critical)
+        & (
+            finish.reindex(edges["Dependency"]).to_numpy()
+            == schedule.loc[edges.index, "Earliest Start"].to_numpy()
+        )
+    )
+    fig.add_trace(dependency_arrows(project_data, edges[~driving]))
+    fig.add_trace(
+        dependency_arrows(
+            project_data, edges[driving], color=CRITICAL_COLOR, name="Critical path"
+        )
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=100, b=0))
+    return fig
+
+
+def dependency_arrows(
+    project_data: pd.DataFrame,
+    edges: typing.Optional[pd.DataFrame] = None,
+    color: str = "black",
+    name: typing.Optional[str] = None,
+) -> go.Scatter:
+    """Create one trace holding an arrow for every dependency.
+
+    Each arrow runs from the end of the dependency's bar to the start of the
+    dependent task's bar (or straight down if the task starts first). Drawing all of
+    them as line segments of a single trace, separated by gaps, keeps the figure
+    small compared to one annotation per arrow.
+
+    Args:
+        project_data (pd.DataFrame): The validated and processed project data.
+        edges (Optional[pd.DataFrame]): The dependencies to draw, as returned by
+            data_loading.dependency_edges; all of them if not given.
+        color (str): The color of the arrows.
+        name (Optional[str]): If given, the trace is shown in the legend as name.
+
+    Returns:
+        go.Scatter: The trace of dependency arrows.
+    """
+    if edges is None:
+        edges = data_loading.dependency_edges(project_data)
+    # look dependencies up by ID instead of scanning the data for each one
+    end_dates = project_data.set_index("ID")["End Date"]
+    dep_ends = end_dates.loc[edges["Dependency"]].to_numpy(dtype="datetime64[s]")
+    starts = project_data.loc[edges.index, "Start Date"].to_numpy(dtype="datetime64[s]")
+
+    # each arrow is three points: tail, head, and a gap before the next arrow
+    count = len(edges)
+    x = np.empty(3 * count, dtype=object)
+    x[0::3] = np.datetime_as_string(dep_ends)
+    x[1::3] = np.datetime_as_string(np.maximum(starts, dep_ends))
+    x[2::3] = None
+    y = np.empty(3 * count, dtype=object)
+    y[0::3] = edges["Dependency"].to_numpy()
+    y[1::3] = edges["ID"].to_numpy()
+    y[2::3] = None
+    # only the head of each arrow gets a marker, pointing along the segment
+    size = np.tile([0, 10, 0], count)
+
+    return go.Scatter(
+        x=x,
+        y=y,
+        mode="lines+markers",
+        line=dict(color=color, width=1.5),
+        marker=dict(symbol="arrow", angleref="previous", size=size, color=color),
+        hoverinfo="skip",
+        name=name,
+        showlegend=name is not None,
+    )
@@ -1,22 +1,46 @@
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, Patch, no_update
 import dash_cytoscape as cyto
+from concurrent.futures import ProcessPoolExecutor
 import json
+import os
+import uuid
 
+import metrics
 from styling import stylesheet
-from elements import all_elements, nodes, nodes_list, edges, loes, loes_list
-from helper import update_downstream_elements
+from elements import all_elements, graph, nodes
+from helper import SessionStatuses, propagate_statuses
+from scenarios import SlipScenarios
 
 # APP CAPABILITIES:
 # 1. DISPLAY LOE NETWORK
 # 2. CLICK AND HOVER TO DISPLAY NODE OBJECTIVE DETAILS
 # 3. CHANGE STATUS OF NODES TO SEE DOWNSTREAM EFFECTS
-#   * have to manually update interdependent nodes to see effect on other interdependent nodes,
-#       can try to improve on this
+#   * effects propagate through every downstream level and between interdependent nodes
+# 4. SIMULATE RANDOM SLIPS TO SHOW HOW LIKELY EACH NODE IS TO END UP BEHIND
 
 app = Dash(__name__)
 
-# Load extra layouts
-cyto.load_extra_layouts()
+# opt-in callback timings at /metrics, see metrics.py
+metrics.register(app.server)
+
+# node statuses live on the server, per session; the browser only receives changes
+session_statuses = SessionStatuses(
+    {node["data"]["id"]: node["data"]["status"] for node in nodes}
+)
+
+# slip scenarios over the graph, run in LOEVIZ_SCENARIO_WORKERS processes if set
+scenarios = SlipScenarios(graph)
+scenario_workers = int(os.environ.get("LOEVIZ_SCENARIO_WORKERS", "0"))
+scenario_executor = ProcessPoolExecutor(scenario_workers) if scenario_workers else None
+
+
+# all elements, with the statuses of a session
+def session_elements(statuses):
+    elements = graph.gather()
+    for node_id, status in statuses.items():
+        elements[graph.index[node_id]]["data"]["status"] = status
+    return elements
+
 
 # CREATE MORE COMPLEX COMPONENTS
 
@@ -42,10 +66,30 @@ node_status_slider = html.Div(
     ],
 )
 
+# slip probability and number of trials of a scenario run
+# nodes are shaded red by how often they ended up behind
+scenario_controls = html.Div(
+    id="scenario-controls",
+    children=[
+        html.H4("Slip Scenarios"),
+        "Slip probability of each unfinished node ",
+        dcc.Input(
+            id="slip-probability", type="number", min=0, max=1, step=0.01, value=0.1
+        ),
+        " trials ",
+        dcc.Input(
+            id="scenario-trials", type="number", min=1, max=100000, step=1, value=1000
+        ),
+        html.Button("Run scenarios", id="run-scenarios"),
+        html.P(id="scenario-summary"),
+    ],
+)
+
 # cytoscape is the network/graph structure for dash
 cytoscape = cyto.Cytoscape(
     id="cytoscape",
-    layout={"name": "dagre", "rankDir": "TB"},
+    # positions are computed on the server (see ProjectGraph.layout)
+    layout={"name": "preset"},
     style={"width": "100%", "height": "500px"},
     elements=all_elements,
     stylesheet=stylesheet,
@@ -53,51 +97,66 @@ cytoscape = cyto.Cytoscape(
 
 # LAYOUT DETERMINES ORGANIZATION OF COMPONENTS ON THE APP
 
-app.layout = html.Div(
-    id="app-container",
-    children=[
-        # title block on top
-        html.Div(
-            id="title-block",
-            children=[
-                html.H1("Project Network"),
-                html.P("Click or hover over an objective to see details"),
-                html.P(
-                    "Click on a node and use the slider to change the status and see downstream effects"
-                ),
-                html.Hr(),
-            ],
-        ),
-        # cytoscape block
-        html.Div(id="cytoscape-block", children=[cytoscape, html.Hr()]),
-        # info block
-        html.Div(
-            id="info-block",
-            children=[
-                # left column displays click data and slider
-                html.Div(
-                    id="left-col",
-                    style={"width": "40%", "height": "200px", "float": "left"},
-                    children=[
-                        html.H4("Click Info"),
-                        html.P(id="cytoscape-tapNodeData-output"),
-                        node_status_slider,
-                    ],
-                ),
-                # right column displays hover data
-                html.Div(
-                    id="right-col",
-                    style={"width": "40%", "height": "100px", "float": "right"},
-                    children=[
-                        html.H4("Hover Info"),
-                        html.P(id="cytoscape-mouseoverNodeData-output"),
-                    ],
-                ),
-                html.Hr(),
-            ],
-        ),
-    ],
-)
+
+# layout is rebuilt on every page load to give each page its own session id,
+# matching the fresh copy of the elements the page starts from
+def serve_layout():
+    # registered right away, so only a dropped session is new to the callbacks and
+    # the first slider change of a page sends a patch
+    session_id = str(uuid.uuid4())
+    session_statuses.register(session_id)
+    return html.Div(
+        id="app-container",
+        children=[
+            # title block on top
+            html.Div(
+                id="title-block",
+                children=[
+                    html.H1("Project Network"),
+                    html.P("Click or hover over an objective to see details"),
+                    html.P(
+                        "Click on a node and use the slider to change the status and see downstream effects"
+                    ),
+                    html.Hr(),
+                ],
+            ),
+            # cytoscape block
+            html.Div(
+                id="cytoscape-block", children=[cytoscape, scenario_controls, html.Hr()]
+            ),
+            # info block
+            html.Div(
+                id="info-block",
+                children=[
+                    # left column displays click data and slider
+                    html.Div(
+                        id="left-col",
+                        style={"width": "40%", "height": "200px", "float": "left"},
+                        children=[
+                            html.H4("Click Info"),
+                            html.P(id="cytoscape-tapNodeData-output"),
+                            node_status_slider,
+                        ],
+                    ),
+                    # right column displays hover data
+                    html.Div(
+                        id="right-col",
+                        style={"width": "40%", "height": "100px", "float": "right"},
+                        children=[
+                            html.H4("Hover Info"),
+                            html.P(id="cytoscape-mouseoverNodeData-output"),
+                        ],
+                    ),
+                    html.Hr(),
+                ],
+            ),
+            # identifies this page's statuses on the server
+            dcc.Store(id="session-id", data=session_id),
+        ],
+    )
+
+
+app.layout = serve_layout
 
 
 # DASH APP CALLBACKS
@@ -105,36 +164,84 @@ app.layout = html.Div(
 
 # show slider if node selected
 @app.callback(Output("slider", "hidden"), Input("cytoscape", "selectedNodeData"))
+@metrics.instrument
 def displaySlider(data):
     return False if data else True
 
 
 # update node status based on slider value
+# only the changed statuses are sent back, as a patch to the elements
 @app.callback(
     Output("cytoscape", "elements"),
     Input("node-status-slider", "value"),
-    Input("cytoscape", "elements"),
-    Input("cytoscape", "selectedNodeData"),
+    State("cytoscape", "selectedNodeData"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
 )
-def updateNodeStatus(value, elements, selected):
+@metrics.instrument
+def updateNodeStatus(value, selected, session_id):
     # create map of values to match slider values
     slider_val_map = {0: "behind", 1: "on track", 2: "ahead", 3: "completed"}
 
     # Update only the selected element(s)
-    if selected:
-        # get ids
-        ids = [nodeData["id"] for nodeData in selected]
-        # access node objects
-        selected_nodes = (
-            (i, n) for i, n in enumerate(elements) if n["data"]["id"] in ids
-        )
-        # update 'status' property in the node
-        for i, node in selected_nodes:
-            elements[i]["data"]["status"] = slider_val_map[value]
+    if value is None or not selected:
+        return no_update
+    lock, statuses, new = session_statuses.get(session_id)
+    with lock:
+        # update status of the selected nodes
+        ids = [nodeData["id"] for nodeData in selected if nodeData["id"] in statuses]
+        changes = {
+            node_id: slider_val_map[value]
+            for node_id in ids
+            if statuses[node_id] != slider_val_map[value]
+        }
+        statuses.update(changes)
         # propagate downstream effects
-        update_downstream_elements(selected, elements)
+        changes.update(propagate_statuses(graph, statuses, ids))
+        if new:
+            # the page may show statuses of a dropped session, so resend them all
+            return session_elements(statuses)
 
-    return elements
+    if not changes:
+        return no_update
+    patch = Patch()
+    for node_id, status in changes.items():
+        patch[graph.index[node_id]]["data"]["status"] = status
+    return patch
+
+
+# run slip scenarios from the session's statuses and shade nodes by their risk
+# of ending up behind; the risks are sent as a patch to the elements
+@app.callback(
+    Output("cytoscape", "elements", allow_duplicate=True),
+    Output("scenario-summary", "children"),
+    Input("run-scenarios", "n_clicks"),
+    State("slip-probability", "value"),
+    State("scenario-trials", "value"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+@metrics.instrument
+def runScenarios(n_clicks, probability, trials, session_id):
+    if probability is None or not trials:
+        return no_update, "Enter a slip probability and a number of trials"
+    lock, statuses, new = session_statuses.get(session_id)
+    with lock:
+        statuses = dict(statuses)
+    risks = scenarios.run(
+        statuses, default=probability, trials=int(trials), executor=scenario_executor
+    )
+
+    # a new session resends every element, so the page shows the statuses the
+    # trials began with
+    elements = session_elements(statuses) if new else Patch()
+    for node_id, risk in risks.items():
+        elements[graph.index[node_id]]["data"]["risk"] = round(risk, 3)
+    expected = sum(risks.values())
+    return elements, (
+        f"Over {int(trials)} trials, {expected:.1f} of {len(risks)} nodes end up "
+        "behind on average. Hover over a node to see its risk."
+    )
 
 
 # display node info when clicked
@@ -142,6 +249,7 @@ def updateNodeStatus(value, elements, selected):
     Output("cytoscape-tapNodeData-output", "children"),
     Input("cytoscape", "tapNodeData"),
 )
+@metrics.instrument
 def displayTapNodeData(data):
     return json.dumps(data, indent=2)
 
@@ -151,6 +259,7 @@ def displayTapNodeData(data):
     Output("cytoscape-mouseoverNodeData-output", "children"),
     Input("cytoscape", "mouseoverNodeData"),
 )
+@metrics.instrument
 def displayTapEdgeData(data):
     return json.dumps(data, indent=2)
 
@@ -1,5 +1,7 @@
 # GENERATE ELEMENTS
 
+from graph import ProjectGraph
+
 # define LOEs
 loes = [
     {
@@ -92,4 +94,9 @@ loes_list = [loe["data"]["id"] for loe in loes]
 nodes = objs + ios
 nodes_list = [node["data"]["id"] for node in nodes]
 edges = deps
-all_elements = loes + nodes + edges
+# the graph stores the elements by column
+graph = ProjectGraph(loes + nodes + edges)
+# store node positions with the elements, for the "preset" layout
+graph.layout()
+# the whole network as cytoscape dicts, with those positions
+all_elements = graph.gather()
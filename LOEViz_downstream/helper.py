@@ -1,104 +1,121 @@
 # HELPER FUNCTIONS
 
+from collections import OrderedDict
+import threading
 
-# update single node based on status of upstream nodes
-def update_single_node(node_id, upstream_status, elements):
-    # new node status is equal to worst case status of upstream nodes
-    if "behind" in upstream_status:
-        new_status = "behind"
-    elif "on track" in upstream_status:
-        new_status = "on track"
-    elif "ahead" in upstream_status:
-        new_status = "ahead"
+from graph import ProjectGraph, strongly_connected_components
+
+# statuses from worst to best; a node is only as far along as its worst input
+STATUS_ORDER = ["behind", "on track", "ahead", "completed"]
+
+
+# get ids of edge endpoints connected to a node, by edge class and direction
+def linked_ids(graph, node_id, classes, direction):
+    if direction == "out":
+        positions, end = graph.out_edges(node_id), "target"
     else:
-        new_status = "completed"
+        positions, end = graph.in_edges(node_id), "source"
+    return [graph.value(i, end) for i in positions if graph.edge_class(i) == classes]
 
-    # access node object
-    current_node = (
-        (i, n) for i, n in enumerate(elements) if n["data"]["id"] == node_id
+
+# get nodes whose status a node depends on (its dependencies and interdependent nodes)
+def upstream_ids(graph, node_id):
+    return (
+        linked_ids(graph, node_id, "dep", "out")
+        + linked_ids(graph, node_id, "interdep", "out")
+        + linked_ids(graph, node_id, "interdep", "in")
     )
-    # update 'status' property
-    for i, node in current_node:
-        elements[i]["data"]["status"] = new_status
-
-
-# update single level of nodes
-def update_level(level, elements, dep_edges, interdep_edges):
-    # loop through all nodes in level
-    for node_id in level:
-        # get upstream nodes that current node depends on
-        upstream_level = [
-            edge["data"]["target"]
-            for edge in dep_edges
-            if edge["data"]["source"] == node_id
-        ]
-        # get nodes that are interdependent with current node
-        upstream_level = upstream_level + [
-            edge["data"]["target"]
-            for edge in interdep_edges
-            if edge["data"]["source"] == node_id
-        ]
-        upstream_level = upstream_level + [
-            edge["data"]["source"]
-            for edge in interdep_edges
-            if edge["data"]["target"] == node_id
-        ]
 
-        # get status of all upstream nodes
-        upstream_status = []
-        for upstream_node_id in upstream_level:
-            upstream_status = upstream_status + [
-                element["data"]["status"]
-                for element in elements
-                if element["data"]["id"] == upstream_node_id
-            ]
 
-        # update node based on status of upstream nodes
-        update_single_node(node_id, upstream_status, elements)
+# get nodes whose status depends on a node (its dependents and interdependent nodes)
+def downstream_ids(graph, node_id):
+    return (
+        linked_ids(graph, node_id, "dep", "in")
+        + linked_ids(graph, node_id, "interdep", "out")
+        + linked_ids(graph, node_id, "interdep", "in")
+    )
+
+
+# get worst case status, unknown statuses are ignored and no statuses means completed
+def worst_status(statuses):
+    ranks = [
+        STATUS_ORDER.index(status) for status in statuses if status in STATUS_ORDER
+    ]
+    return STATUS_ORDER[min(ranks, default=len(STATUS_ORDER) - 1)]
+
 
+# propagate the status of changed nodes to everything downstream of them
+# statuses maps node id -> status and is updated in place; returns the updated entries
+def propagate_statuses(graph, statuses, changed_ids):
+    changed_ids = set(changed_ids)
 
-# update downstream elements
-# issue when interdependent nodes have same dependencies upstream (e.g. O1.1 - O1.2)
+    # interdependent nodes (and any dependency cycle) form strongly connected
+    # components that share one status; components come out downstream first
+    components = strongly_connected_components(
+        changed_ids, lambda node_id: downstream_ids(graph, node_id)
+    )
+
+    updates = {}
+    # walk the downstream cone upstream first, so every input is final when used
+    for component in reversed(components):
+        members = set(component)
+        # statuses feeding into the component from outside it; changed nodes keep
+        # the status they were given, so that (not their inputs) feeds their component
+        inputs = [
+            statuses.get(upstream_id)
+            for node_id in members - changed_ids
+            for upstream_id in upstream_ids(graph, node_id)
+            if upstream_id not in members
+        ]
+        inputs += [statuses.get(node_id) for node_id in members & changed_ids]
+        new_status = worst_status(inputs)
+        for node_id in component:
+            if node_id not in changed_ids and statuses.get(node_id) != new_status:
+                statuses[node_id] = new_status
+                updates[node_id] = new_status
+
+    return updates
+
+
+# update downstream elements of the selected nodes in place
 def update_downstream_elements(selected, elements):
-    # extract selected node id
-    selected_id = selected[0]["id"]
+    # index elements once so lookups don't rescan the element list
+    graph = ProjectGraph(elements)
+    statuses = {node_id: graph.value(i, "status") for node_id, i in graph.index.items()}
 
-    # separate dependent and independent edges because they have different update mechanisms
-    dep_edges = [element for element in elements if element["classes"] == "dep"]
-    interdep_edges = [
-        element for element in elements if element["classes"] == "interdep"
-    ]
+    updates = propagate_statuses(
+        graph, statuses, [nodeData["id"] for nodeData in selected]
+    )
+    # the graph keeps its own copy of the elements, so update the given ones
+    for node_id, status in updates.items():
+        elements[graph.index[node_id]]["data"]["status"] = status
+
+
+# server-side node statuses, one copy per browser session
+# the least recently used sessions are dropped once there are too many; a dropped
+# session that is used again starts over from the initial statuses, and get reports
+# it as new so the page can be sent all of its elements again
+class SessionStatuses:
+    def __init__(self, initial, max_sessions=256):
+        self.initial = dict(initial)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    # start a session from the initial statuses, when its page is served with them
+    def register(self, session_id):
+        self.get(session_id)
 
-    # initialize loop parameters
-    finished = False
-    current_node_level = [selected_id]
-
-    # loop until all downstream nodes checked
-    while not finished:
-        # initialize empty list of next downstream level
-        next_nodes = []
-
-        # loop through all nodes in current level
-        for node_id in current_node_level:
-            # find nodes in next downstream level and add to list
-            next_nodes = next_nodes + [
-                edge["data"]["source"]
-                for edge in dep_edges
-                if edge["data"]["target"] == node_id
-            ]
-            # get interdependent nodes
-            next_nodes = next_nodes + [
-                edge["data"]["target"]
-                for edge in interdep_edges
-                if edge["data"]["source"] == node_id
-            ]
-            next_nodes = next_nodes + [
-                edge["data"]["source"]
-                for edge in interdep_edges
-                if edge["data"]["target"] == node_id
-            ]
-
-            # update status of next downstream level
-            update_level(next_nodes, elements, dep_edges, interdep_edges)
-
-        finished = True
+    # get (lock, statuses, new) for a session, starting from the initial statuses;
+    # new is True if the session was not registered (or was dropped since), so the
+    # page may not show these statuses
+    # hold the lock while reading or changing the statuses
+    def get(self, session_id):
+        with self._lock:
+            new = session_id not in self._sessions
+            if new:
+                self._sessions[session_id] = (threading.Lock(), dict(self.initial))
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return (*self._sessions[session_id], new)
@@ -0,0 +1,200 @@
+# CALLBACK AND LOADING METRICS
+
+import cProfile
+import contextlib
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import plotly.utils
+
+# metrics are only recorded when LOEVIZ_METRICS is set (to anything but 0), so an
+# uninstrumented app runs the callbacks exactly as written
+ENABLED = os.environ.get("LOEVIZ_METRICS", "0") not in ("", "0")
+# when set, every callback call is also profiled, and the accumulated profile of
+# each callback is saved there as <callback>.prof (open with pstats or snakeviz)
+PROFILE_DIR = os.environ.get("LOEVIZ_PROFILE_DIR") or None
+
+_lock = threading.Lock()
+# callback name -> totals over all calls
+_callbacks = defaultdict(
+    lambda: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "in": 0, "out": 0}
+)
+# loading stage name -> totals over all runs
+_stages = defaultdict(lambda: {"runs": 0, "seconds": 0.0, "last_seconds": 0.0})
+# only one profiler can be active at a time, so profiled calls take turns
+_profile_lock = threading.Lock()
+_profiles = {}
+
+
+def payload_size(value) -> int:
+    """Get the size in bytes of a value serialized to JSON as Dash sends it."""
+    try:
+        return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+    except (TypeError, ValueError):
+        return 0
+
+
+def instrument(function):
+    """Record the time, payload sizes and calls of a Dash callback.
+
+    Goes directly above the callback function, below @app.callback. Returns the
+    function unchanged unless LOEVIZ_METRICS or LOEVIZ_PROFILE_DIR is set.
+    """
+    if not ENABLED and PROFILE_DIR is None:
+        return function
+
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        if PROFILE_DIR is None:
+            result = function(*args, **kwargs)
+        else:
+            result = _profiled(name, function, args, kwargs)
+        elapsed = time.perf_counter() - start
+
+        if ENABLED:
+            size_in = payload_size([args, kwargs])
+            size_out = payload_size(result)
+            with _lock:
+                totals = _callbacks[name]
+                totals["calls"] += 1
+                totals["seconds"] += elapsed
+                totals["max_seconds"] = max(totals["max_seconds"], elapsed)
+                totals["in"] += size_in
+                totals["out"] += size_out
+        return result
+
+    return wrapper
+
+
+def _profiled(name, function, args, kwargs):
+    """Call a function under the accumulated profile of its callback, and save it."""
+    with _profile_lock:
+        profile = _profiles.setdefault(name, cProfile.Profile())
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a stage of loading the project data, as `with stage("name"):`."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            totals = _stages[name]
+            totals["runs"] += 1
+            totals["seconds"] += elapsed
+            totals["last_seconds"] = elapsed
+
+
+def _label(value: str) -> str:
+    return re.sub(r'(["\\])', r"\\\1", value).replace("\n", r"\n")
+
+
+def render() -> str:
+    """Get all metrics in the Prometheus text exposition format."""
+    with _lock:
+        callbacks = {name: dict(totals) for name, totals in _callbacks.items()}
+        stages = {name: dict(totals) for name, totals in _stages.items()}
+
+    lines = []
+
+    def family(metric, kind, description, label, rows, key):
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, totals in sorted(rows.items()):
+            lines.append(f'{metric}{{{label}="{_label(name)}"}} {totals[key]}')
+
+    family(
+        "loeviz_callback_calls_total",
+        "counter",
+        "Number of calls of each callback.",
+        "callback",
+        callbacks,
+        "calls",
+    )
+    family(
+        "loeviz_callback_seconds_total",
+        "counter",
+        "Total wall time spent in each callback.",
+        "callback",
+        callbacks,
+        "seconds",
+    )
+    family(
+        "loeviz_callback_max_seconds",
+        "gauge",
+        "Longest wall time of a single call of each callback.",
+        "callback",
+        callbacks,
+        "max_seconds",
+    )
+    family(
+        "loeviz_callback_input_bytes_total",
+        "counter",
+        "Total JSON size of the inputs and states given to each callback.",
+        "callback",
+        callbacks,
+        "in",
+    )
+    family(
+        "loeviz_callback_output_bytes_total",
+        "counter",
+        "Total JSON size of the outputs returned by each callback.",
+        "callback",
+        callbacks,
+        "out",
+    )
+    family(
+        "loeviz_load_stage_runs_total",
+        "counter",
+        "Number of runs of each stage of loading the project data.",
+        "stage",
+        stages,
+        "runs",
+    )
+    family(
+        "loeviz_load_stage_seconds_total",
+        "counter",
+        "Total wall time spent in each stage of loading the project data.",
+        "stage",
+        stages,
+        "seconds",
+    )
+    family(
+        "loeviz_load_stage_last_seconds",
+        "gauge",
+        "Wall time of the latest run of each stage of loading the project data.",
+        "stage",
+        stages,
+        "last_seconds",
+    )
+    return "\n".join(lines) + "\n"
+
+
+def register(server):
+    """Serve the metrics at /metrics on the app's Flask server, if enabled."""
+    if not ENABLED:
+        return
+
+    from flask import Response
+
+    @server.route("/metrics")
+    def serve_metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
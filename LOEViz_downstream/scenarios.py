@@ -0,0 +1,187 @@
+# MONTE-CARLO SLIP SCENARIOS
+
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+from graph import ProjectGraph, strongly_connected_components
+from helper import downstream_ids
+
+# trials run per task sent to an executor
+CHUNK_TRIALS = 1024
+
+
+class SlipScenarios:
+    """Monte-Carlo estimate of how random slips spread downstream.
+
+    In every trial each task slips (falls "behind") at random, with its own
+    probability, and the slip propagates to everything downstream of it, as when
+    a task is set to "behind" in the app (see helper.propagate_statuses). A task
+    ends the trial behind if it is downstream of a slipped task, slipped itself, or
+    was behind already.
+
+    The graph is condensed once into its strongly connected components (a group of
+    interdependent tasks falls behind together) and ordered into topological
+    levels. Trials are then run thousands at a time: the trials of every component
+    are bits of a NumPy array row, and a level takes a single OR of the rows of the
+    components upstream of it, so the work done in Python grows with the number of
+    levels, not with the number of tasks or trials.
+
+    Args:
+        graph (ProjectGraph): The project graph. Tasks are the nodes with a
+            "status".
+    """
+
+    def __init__(self, graph: ProjectGraph):
+        self.statuses = {
+            node_id: graph.value(i, "status")
+            for node_id, i in graph.index.items()
+            if graph.value(i, "status") is not None
+        }
+        self.ids = list(self.statuses)
+        tasks = set(self.ids)
+
+        def successors(node_id):
+            return [other for other in downstream_ids(graph, node_id) if other in tasks]
+
+        # components come out downstream first
+        components = strongly_connected_components(self.ids, successors)[::-1]
+        component_of = {
+            node_id: number
+            for number, component in enumerate(components)
+            for node_id in component
+        }
+        self.component = np.array(
+            [component_of[node_id] for node_id in self.ids], dtype=np.int64
+        )
+
+        # edges between components, upstream -> downstream, and the level of every
+        # component: one past the level of the latest component upstream of it
+        sources, targets = [], []
+        level = np.zeros(len(components), dtype=np.int64)
+        for number, component in enumerate(components):
+            for node_id in component:
+                for other in successors(node_id):
+                    if component_of[other] != number:
+                        sources.append(number)
+                        targets.append(component_of[other])
+        for source, target in sorted(zip(sources, targets)):
+            level[target] = max(level[target], level[source] + 1)
+        self.sources = np.array(sources, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+        self.level = level
+
+    def run(
+        self,
+        statuses: Optional[dict] = None,
+        probabilities: Optional[dict] = None,
+        default: float = 0.1,
+        trials: int = 1000,
+        seed: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> dict[str, float]:
+        """Run slip trials and get how often every task ends behind.
+
+        Args:
+            statuses (Optional[dict[str, str]]): The status of every task to start
+                from, e.g. a session's statuses; defaults to the statuses in the
+                elements.
+            probabilities (dict[str, float]): The slip probability of some tasks.
+            default (float): The slip probability of other unfinished tasks;
+                completed tasks only slip if given a probability, and tasks that
+                are behind always slip.
+            trials (int): The number of trials.
+            seed (Optional[int]): Seed of the random generator, for repeatable
+                results.
+            executor (Optional[Executor]): If given, e.g. a ProcessPoolExecutor,
+                the trials are run on it in chunks of CHUNK_TRIALS.
+
+        Returns:
+            dict[str, float]: The fraction of trials in which each task ended
+                behind.
+        """
+        statuses = self.statuses if statuses is None else statuses
+        probabilities = probabilities or {}
+
+        def probability(node_id):
+            status = statuses.get(node_id)
+            # a task that is behind already has slipped, in every trial
+            if status == "behind":
+                return 1.0
+            return probabilities.get(node_id, 0.0 if status == "completed" else default)
+
+        slip = np.array(
+            [probability(node_id) for node_id in self.ids], dtype=np.float32
+        )
+        arguments = (self.component, self.sources, self.targets, self.level, slip)
+        seeds = np.random.SeedSequence(seed)
+        if executor is None:
+            counts = simulate(*arguments, trials, seeds)
+        else:
+            chunks = [
+                min(CHUNK_TRIALS, trials - start)
+                for start in range(0, trials, CHUNK_TRIALS)
+            ]
+            futures = [
+                executor.submit(simulate, *arguments, chunk, child)
+                for chunk, child in zip(chunks, seeds.spawn(len(chunks)))
+            ]
+            counts = sum(future.result() for future in futures)
+
+        return {
+            node_id: count / trials for node_id, count in zip(self.ids, counts.tolist())
+        }
+
+
+def simulate(
+    component: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    level: np.ndarray,
+    slip: np.ndarray,
+    trials: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Run slip trials over a condensed graph (see SlipScenarios).
+
+    A module-level function of arrays only, so it can be sent to another process.
+
+    Args:
+        component (np.ndarray): The component of every task.
+        sources (np.ndarray): The upstream component of every edge between
+            components.
+        targets (np.ndarray): The downstream component of every edge.
+        level (np.ndarray): The topological level of every component.
+        slip (np.ndarray): The slip probability of every task.
+        trials (int): The number of trials.
+        seed (np.random.SeedSequence): Seeds the random generator.
+
+    Returns:
+        np.ndarray: The number of trials in which each task ended downstream of a
+            slip (or slipped itself).
+    """
+    rng = np.random.default_rng(seed)
+    # one row per task, one bit per trial
+    draws = rng.random((len(slip), trials), dtype=np.float32)
+    slipped = np.packbits(draws < slip[:, None], axis=1)
+
+    # a component is behind in a trial if any of its tasks slipped
+    count = len(level)
+    behind = np.zeros((count, slipped.shape[1]), dtype=np.uint8)
+    np.bitwise_or.at(behind, component, slipped)
+
+    # then, a level at a time, if any component upstream of it is behind
+    order = np.lexsort((targets, level[targets]))
+    sources, targets = sources[order], targets[order]
+    bounds = np.searchsorted(level[targets], np.arange(level.max(initial=0) + 2))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if start == end:
+            continue
+        # OR the rows of every component's upstream edges together, per component
+        downstream, first = np.unique(targets[start:end], return_index=True)
+        reached = np.bitwise_or.reduceat(behind[sources[start:end]], first, axis=0)
+        behind[downstream] |= reached
+
+    counts = np.unpackbits(behind, axis=1, count=trials).sum(axis=1)
+    return counts[component]
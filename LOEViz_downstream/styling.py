@@ -46,4 +46,13 @@ stylesheet = [
     {"selector": 'node[status = "on track"]', "style": {"background-color": "yellow"}},
     {"selector": '[status = "ahead"]', "style": {"background-color": "green"}},
     {"selector": '[status = "completed"]', "style": {"background-color": "blue"}},
+    # Slip risk heat, from 0 (no overlay) to 1 (strong red overlay)
+    {
+        "selector": "node[risk]",
+        "style": {
+            "overlay-color": "red",
+            "overlay-padding": 6,
+            "overlay-opacity": "mapData(risk, 0, 1, 0, 0.6)",
+        },
+    },
 ]
@@ -0,0 +1,52 @@
+# TESTS OF STATUS PROPAGATION
+
+from graph import ProjectGraph
+from helper import SessionStatuses, propagate_statuses
+
+
+def project_graph(statuses, dependencies, interdependencies=()):
+    """Build a graph of nodes with the given statuses, dependencies (node, the node
+    it depends on) and interdependent pairs."""
+    nodes = [{"data": {"id": node_id, "status": s}} for node_id, s in statuses.items()]
+    edges = [
+        {"data": {"source": source, "target": target}, "classes": classes}
+        for pairs, classes in [(dependencies, "dep"), (interdependencies, "interdep")]
+        for source, target in pairs
+    ]
+    return ProjectGraph(nodes + edges)
+
+
+def test_changed_node_keeps_its_status():
+    """A changed node's own dependencies do not hold back its dependents."""
+    statuses = {"X": "behind", "A": "ahead", "C": "behind"}
+    graph = project_graph(statuses, [("A", "X"), ("C", "A")])
+
+    assert propagate_statuses(graph, statuses, ["A"]) == {"C": "ahead"}
+
+
+def test_interdependent_nodes_follow_changed_node():
+    """Nodes interdependent with a changed node take its status, even if the
+    changed node depends on a node that is behind."""
+    statuses = {"X": "behind", "A": "ahead", "B": "behind"}
+    graph = project_graph(statuses, [("A", "X")], [("A", "B")])
+
+    assert propagate_statuses(graph, statuses, ["A"]) == {"B": "ahead"}
+    assert statuses == {"X": "behind", "A": "ahead", "B": "ahead"}
+
+
+def test_interdependent_nodes_keep_outside_inputs():
+    """Unchanged members of a component still take their own dependencies into
+    account."""
+    statuses = {"Y": "on track", "A": "ahead", "B": "behind"}
+    graph = project_graph(statuses, [("B", "Y")], [("A", "B")])
+
+    assert propagate_statuses(graph, statuses, ["A"]) == {"B": "on track"}
+
+
+def test_registered_session_is_not_new():
+    """A session is only new if it was never registered or was dropped since."""
+    sessions = SessionStatuses({"A": "on track"}, max_sessions=1)
+    sessions.register("first")
+    assert sessions.get("first")[2] is False
+    sessions.register("second")
+    assert sessions.get("first")[2] is True
@@ -2,8 +2,9 @@ from dash import Dash, html, dcc, Input, Output
 import dash_cytoscape as cyto
 import json
 
+import metrics
 from styling import stylesheet
-from elements import all_elements, nodes, nodes_list, edges, loes, loes_list
+from elements import all_elements, graph, nodes_list
 
 # APP CAPABILITIES:
 # 1. DISPLAY LOE NETWORK
@@ -12,18 +13,49 @@ from elements import all_elements, nodes, nodes_list, edges, loes, loes_list
 
 app = Dash(__name__)
 
-cyto.load_extra_layouts()
+# opt-in callback timings at /metrics, see metrics.py
+metrics.register(app.server)
 
 # CREATE MORE COMPLEX COMPONENTS
 # node checklist allows user to select nodes and show local dependencies
-node_checklist = dcc.Checklist(
-    id="node_checklist", options=nodes_list, value=nodes_list
+# nothing is selected at first, which shows the whole network
+node_checklist = dcc.Checklist(id="node_checklist", options=nodes_list, value=[])
+
+# options for how far the local network reaches from the selected nodes
+neighborhood_options = html.Div(
+    id="neighborhood-options",
+    children=[
+        html.Label("Hops"),
+        dcc.Slider(id="hops-slider", min=0, max=5, step=1, value=1),
+        html.Label("Direction"),
+        dcc.RadioItems(
+            id="direction-radio",
+            options=[
+                {"label": "both", "value": "both"},
+                {"label": "upstream (dependencies)", "value": "upstream"},
+                {"label": "downstream (dependents)", "value": "downstream"},
+            ],
+            value="both",
+            inline=True,
+        ),
+        html.Label("Edges"),
+        dcc.Checklist(
+            id="edge-class-checklist",
+            options=[
+                {"label": "dependent", "value": "dep"},
+                {"label": "interdependent", "value": "interdep"},
+            ],
+            value=["dep", "interdep"],
+            inline=True,
+        ),
+    ],
 )
 
 # cytoscape is the network/graph structure for dash
 cytoscape = cyto.Cytoscape(
     id="cytoscape",
-    layout={"name": "dagre", "rankDir": "TB"},
+    # positions are computed on the server (see ProjectGraph.layout)
+    layout={"name": "preset"},
     style={"width": "100%", "height": "500px"},
     elements=all_elements,
     stylesheet=stylesheet,
@@ -41,11 +73,17 @@ app.layout = html.Div(
                 html.H1("Project Network"),
                 html.P("Click or hover over an objective to see details"),
                 html.P("Select nodes from the checklist to see local network"),
+                html.P(
+                    "Choose how many hops, in which direction and along which edges the local network reaches"
+                ),
                 html.Hr(),
             ],
         ),
         # menu block for filters, checklist, etc.
-        html.Div(id="menu-block", children=[node_checklist, html.Hr()]),
+        html.Div(
+            id="menu-block",
+            children=[node_checklist, html.Hr(), neighborhood_options, html.Hr()],
+        ),
         # cytoscape block
         html.Div(id="cytoscape-block", children=[cytoscape, html.Hr()]),
         # info block
@@ -81,66 +119,27 @@ app.layout = html.Div(
 
 
 # node checklist displays selected nodes + dependencies
-@app.callback(Output("cytoscape", "elements"), Input("node_checklist", "value"))
+@app.callback(
+    Output("cytoscape", "elements"),
+    Input("node_checklist", "value"),
+    Input("hops-slider", "value"),
+    Input("direction-radio", "value"),
+    Input("edge-class-checklist", "value"),
+)
 # update cytoscape based on nodes selected from checklist
-def node_filter(node_checklist):
-    selected_nodes = []
-    selected_edges = []
-
-    # loop through all selected nodes
-    for node_id in node_checklist:
-        # add selected nodes
-        for node in nodes:
-            if node["data"]["id"] == node_id:
-                selected_nodes.append(node)
-                loe_node = next(
-                    loe for loe in loes if loe["data"]["id"] == node["data"]["parent"]
-                )
-                selected_nodes.append(loe_node)
-
-        # add connected edges
-        for edge in edges:
-            source_node = edge["data"]["source"]
-            target_node = edge["data"]["target"]
-            # add all edges where selected node is source
-            if source_node == node_id:
-                selected_edges.append(edge)
-                # add corresponding target to complete edge
-                new_target = next(
-                    node for node in nodes if node["data"]["id"] == target_node
-                )
-                selected_nodes.append(new_target)
-                loe_node = next(
-                    loe
-                    for loe in loes
-                    if loe["data"]["id"] == new_target["data"]["parent"]
-                )
-                selected_nodes.append(loe_node)
-            # add all edges where selected node is target
-            if target_node == node_id:
-                selected_edges.append(edge)
-                # add corresponding source to complete edge
-                new_source = next(
-                    node for node in nodes if node["data"]["id"] == source_node
-                )
-                selected_nodes.append(new_source)
-                loe_node = next(
-                    loe
-                    for loe in loes
-                    if loe["data"]["id"] == new_source["data"]["parent"]
-                )
-                selected_nodes.append(loe_node)
-
-    # remove duplicate nodes
-    sel_nodes = []
-    [sel_nodes.append(node) for node in selected_nodes if node not in sel_nodes]
-
-    # remove duplicate edges
-    sel_edges = []
-    [sel_edges.append(edge) for edge in selected_edges if edge not in sel_edges]
-
-    # return selected elements
-    return sel_nodes + sel_edges
+@metrics.instrument
+def node_filter(node_checklist, hops=1, direction="both", edge_classes=None):
+    # no selection shows the whole network
+    if not node_checklist:
+        return all_elements
+    # selected nodes, nodes reached within the given hops along the chosen edges,
+    # the edges followed, and the parent loes of all of those nodes
+    return graph.query_elements(
+        node_checklist,
+        hops=hops,
+        direction=direction,
+        classes=None if edge_classes is None else set(edge_classes),
+    )
 
 
 # click element to display info
@@ -148,6 +147,7 @@ def node_filter(node_checklist):
     Output("cytoscape-tapNodeData-output", "children"),
     Input("cytoscape", "selectedNodeData"),
 )
+@metrics.instrument
 def displayTapNodeData(data):
     return json.dumps(data, indent=2)
 
@@ -157,6 +157,7 @@ def displayTapNodeData(data):
     Output("cytoscape-mouseoverNodeData-output", "children"),
     Input("cytoscape", "mouseoverNodeData"),
 )
+@metrics.instrument
 def displayHoverNodeData(data):
     if data:
         return json.dumps(data, indent=2)
@@ -0,0 +1,4 @@
+"""Benchmarks for the LOEViz apps, run on synthetic projects.
+
+Run from the repository root with ``python -m benchmarks``; see run.py.
+"""
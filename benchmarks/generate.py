@@ -0,0 +1,198 @@
+# GENERATE SYNTHETIC PROJECTS
+
+import random
+
+import pandas as pd
+
+COLUMNS = ["ID", "Description", "Start Date", "End Date", "Status", "Dependencies"]
+# workbook statuses, and the statuses used by LOEViz_downstream and LOEViz_local
+STATUSES = ["On Track", "At Risk", "Complete", "Overdue"]
+ELEMENT_STATUSES = ["behind", "on track", "ahead", "completed"]
+START = pd.Timestamp("2023-01-02")
+
+
+def zeroless(k: int) -> int:
+    """Get the k-th (counting from 0) positive integer with no 0 digit.
+
+    IDs only allow the digits 1-9 (see data_loading.ID_PATTERN), so LOEs and
+    objectives are numbered 1, ..., 9, 11, ..., 19, 21, ...
+
+    Args:
+        k (int): The position in the sequence.
+
+    Returns:
+        int: The number.
+    """
+    digits = []
+    k += 1
+    while k:
+        k, digit = divmod(k - 1, 9)
+        digits.append(str(digit + 1))
+    return int("".join(reversed(digits)))
+
+
+def generate_tasks(
+    n_loes: int, fanout: int, density: float, seed: int = 0
+) -> list[tuple[str, str, list[str]]]:
+    """Generate the LOE/O/IO hierarchy and dependencies of a synthetic project.
+
+    Every LOE has fanout objectives and every objective has fanout intermediate
+    objectives. An objective depends on its own intermediate objectives, and every
+    objective and intermediate objective also depends on density other tasks on
+    average, picked among the tasks generated before it so there are no cycles.
+
+    Args:
+        n_loes (int): The number of LOEs.
+        fanout (int): The number of children of every LOE and objective.
+        density (float): The average number of extra dependencies per task.
+        seed (int): The seed of the random generator; equal seeds give equal
+            projects.
+
+    Returns:
+        list[tuple[str, str, list[str]]]: (ID, parent LOE ID, dependency IDs) for
+            every task, LOEs first, then each task after all of its dependencies.
+            LOEs have no parent and depend on their objectives.
+    """
+    rng = random.Random(seed)
+    loes = []
+    tasks = []
+    for loe in map(zeroless, range(n_loes)):
+        objectives = []
+        for obj in map(zeroless, range(fanout)):
+            ios = [f"IO{loe}.{obj}.{zeroless(io)}" for io in range(fanout)]
+            for io in ios:
+                tasks.append((io, f"LOE{loe}", []))
+            objectives.append(f"O{loe}.{obj}")
+            tasks.append((objectives[-1], f"LOE{loe}", list(ios)))
+        loes.append((f"LOE{loe}", None, objectives))
+
+    # extra dependencies on earlier tasks, skipping ones already depended on
+    for position in range(1, len(tasks)):
+        count = int(density) + (rng.random() < density - int(density))
+        dependencies = tasks[position][2]
+        for _ in range(count):
+            dependency = tasks[rng.randrange(position)][0]
+            if dependency not in dependencies:
+                dependencies.append(dependency)
+
+    return loes + tasks
+
+
+def generate_project(
+    n_loes: int, fanout: int, density: float, seed: int = 0
+) -> pd.DataFrame:
+    """Generate a synthetic project in the workbook format.
+
+    Tasks start after their dependencies end, LOEs span their objectives, and
+    statuses are random, so the result passes every check in data_loading.
+
+    Args:
+        n_loes (int): The number of LOEs.
+        fanout (int): The number of children of every LOE and objective.
+        density (float): The average number of extra dependencies per task.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The project data, with the workbook's columns.
+    """
+    rng = random.Random(seed)
+    tasks = generate_tasks(n_loes, fanout, density, seed)
+    n_loe_rows = sum(task_id.startswith("LOE") for task_id, _, _ in tasks)
+
+    # schedule tasks after their dependencies, in generation order
+    dates = {}
+    for task_id, _, dependencies in tasks[n_loe_rows:]:
+        start = max(
+            (dates[dependency][1] for dependency in dependencies),
+            default=START + pd.Timedelta(days=rng.randrange(30)),
+        )
+        start += pd.Timedelta(days=rng.randrange(3))
+        dates[task_id] = (start, start + pd.Timedelta(days=rng.randint(1, 20)))
+    for task_id, _, objectives in tasks[:n_loe_rows]:
+        spans = [dates[objective] for objective in objectives] or [
+            (START, START + pd.Timedelta(days=1))
+        ]
+        dates[task_id] = (min(s for s, _ in spans), max(e for _, e in spans))
+
+    return pd.DataFrame(
+        [
+            (
+                task_id,
+                f"Synthetic task {task_id}",
+                dates[task_id][0],
+                dates[task_id][1],
+                rng.choice(STATUSES),
+                ",".join(dependencies) if dependencies else None,
+            )
+            for task_id, _, dependencies in tasks
+        ],
+        columns=COLUMNS,
+    )
+
+
+def write_workbook(df: pd.DataFrame, filename: str):
+    """Write a generated project to an Excel workbook, as the apps expect it."""
+    df.to_excel(filename, sheet_name="LOEs, IOs, and Objectives", index=False)
+
+
+def generate_elements(
+    n_loes: int, fanout: int, density: float, seed: int = 0
+) -> list[dict]:
+    """Generate a synthetic project as cytoscape elements.
+
+    The elements follow the format of elements.py in LOEViz_downstream and
+    LOEViz_local. Sibling objectives are interdependent with probability density / 4.
+
+    Args:
+        n_loes (int): The number of LOEs.
+        fanout (int): The number of children of every LOE and objective.
+        density (float): The average number of extra dependencies per task.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list[dict]: The LOE nodes, then objective nodes, then edges.
+    """
+    rng = random.Random(seed)
+    tasks = generate_tasks(n_loes, fanout, density, seed)
+
+    loes = []
+    nodes = []
+    edges = []
+    for task_id, parent, dependencies in tasks:
+        if task_id.startswith("LOE"):
+            loes.append(
+                {
+                    "data": {"id": task_id, "label": task_id, "description": task_id},
+                    "position": {"x": 0, "y": 0},
+                    "classes": "loe",
+                }
+            )
+            # interdependent sibling objectives
+            for first, second in zip(dependencies, dependencies[1:]):
+                if rng.random() < density / 4:
+                    edges.append(
+                        {
+                            "data": {"source": first, "target": second},
+                            "classes": "interdep",
+                        }
+                    )
+            continue
+        nodes.append(
+            {
+                "data": {
+                    "id": task_id,
+                    "label": task_id,
+                    "description": task_id,
+                    "status": rng.choice(ELEMENT_STATUSES),
+                    "parent": parent,
+                },
+                "position": {"x": 0, "y": 0},
+                "classes": "io" if task_id.startswith("IO") else "obj",
+            }
+        )
+        edges += [
+            {"data": {"source": task_id, "target": dependency}, "classes": "dep"}
+            for dependency in dependencies
+        ]
+
+    return loes + nodes + edges
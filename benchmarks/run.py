@@ -0,0 +1,399 @@
+# RUN BENCHMARKS
+
+import argparse
+import copy
+import datetime
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+from benchmarks import generate, startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# module names used by more than one app folder
+APP_MODULES = (
+    "aggregate",
+    "app",
+    "cache",
+    "data_loading",
+    "elements",
+    "graph",
+    "helper",
+    "metrics",
+    "projects",
+    "scenarios",
+    "schedule",
+    "shared",
+    "snapshot",
+    "styling",
+    "timeline",
+)
+# name -> (number of LOEs, fanout, dependency density)
+SCALES = {
+    "small": (5, 4, 1.0),
+    "medium": (20, 8, 1.5),
+    "large": (50, 12, 2.0),
+}
+
+
+def app_modules(folder: str, *names: str) -> types.SimpleNamespace:
+    """Import modules of one app folder without mixing them up with another's.
+
+    Every app folder has its own flat modules (graph, elements, ...), so they are
+    imported with only that folder on the path, and removed from sys.modules again
+    afterwards.
+
+    Args:
+        folder (str): The app folder, e.g. "LOEViz_base".
+        *names (str): The modules to import.
+
+    Returns:
+        types.SimpleNamespace: The imported modules, by name.
+    """
+    path = os.path.join(ROOT, folder)
+    saved = {name: sys.modules.pop(name) for name in APP_MODULES if name in sys.modules}
+    sys.path.insert(0, path)
+    try:
+        return types.SimpleNamespace(
+            **{name: importlib.import_module(name) for name in names}
+        )
+    finally:
+        sys.path.remove(path)
+        for name in APP_MODULES:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+def measure(function, setup=None, repeat: int = 5) -> dict:
+    """Time a function.
+
+    Args:
+        function (Callable): The function to time. It is given the result of setup.
+        setup (Callable): Prepares the input of every run; not timed.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The fastest and median run times in seconds, and the number of runs.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": repeat}
+
+
+def peak_memory(function) -> int:
+    """Get the most memory a function allocates at once, in bytes (one untimed run,
+    since tracing allocations slows it down)."""
+    tracemalloc.start()
+    try:
+        function(None)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(scales: list[str], repeat: int = 5) -> list[dict]:
+    """Run every benchmark at the given scales.
+
+    Args:
+        scales (list[str]): Names of entries of SCALES.
+        repeat (int): The number of timed runs of every benchmark.
+
+    Returns:
+        list[dict]: One result per benchmark and scale.
+    """
+    base = app_modules(
+        "LOEViz_base",
+        "data_loading",
+        "elements",
+        "graph",
+        "schedule",
+        "timeline",
+        "aggregate",
+    )
+    local = app_modules("LOEViz_local", "graph")
+    downstream = app_modules("LOEViz_downstream", "graph", "helper", "scenarios")
+
+    results = []
+
+    def record(name, scale, size, timing, **extra):
+        result = {"name": name, "scale": scale, **size, **timing, **extra}
+        results.append(result)
+        print(
+            f"{name:<28} {scale:<8} median {timing['median_s'] * 1000:10.2f} ms",
+            flush=True,
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            n_loes, fanout, density = SCALES[scale]
+            df = generate.generate_project(n_loes, fanout, density)
+            elements = generate.generate_elements(n_loes, fanout, density)
+            size = {"rows": len(df), "elements": len(elements)}
+
+            # loading from the workbook, with and without the cache
+            workbook = os.path.join(directory, f"{scale}.xlsx")
+            generate.write_workbook(df, workbook)
+
+            def fresh_workbook():
+                path = os.path.join(directory, "load.xlsx")
+                shutil.copyfile(workbook, path)
+                shutil.rmtree(os.path.join(directory, ".loeviz_cache"), True)
+                return path
+
+            record(
+                "load_data",
+                scale,
+                size,
+                measure(
+                    lambda path: base.data_loading.load_data(path, use_cache=False),
+                    fresh_workbook,
+                    repeat,
+                ),
+            )
+            cached = fresh_workbook()
+
+            # a status change (complete -> at risk -> overdue) reaches one more
+            # level of dependents on every load, which writes the workbook again;
+            # load until it stops changing, so the timed loads are cache hits
+            def contents():
+                with open(cached, "rb") as f:
+                    return f.read()
+
+            written = None
+            while written != (written := contents()):
+                base.data_loading.load_data(cached)
+            record(
+                "load_data_cached",
+                scale,
+                size,
+                measure(lambda _: base.data_loading.load_data(cached), None, repeat),
+            )
+
+            # element construction and the filters built on it
+            project_data = base.data_loading.process_statuses(df)
+
+            def build(_):
+                return base.graph.ProjectGraph(
+                    base.elements.build_elements(project_data)
+                )
+
+            # the memory of the graph's indexes should grow with the number of
+            # elements, not with nodes x elements
+            record(
+                "build_elements",
+                scale,
+                size,
+                measure(build, None, repeat),
+                peak_bytes=peak_memory(build),
+            )
+            graph = build(None)
+            loe_ids = list(graph.children)
+            record(
+                "loe_filter",
+                scale,
+                size,
+                measure(
+                    lambda _: graph.loe_elements(loe_ids[: len(loe_ids) // 2 or 1]),
+                    None,
+                    repeat,
+                ),
+            )
+            # every LOE at the automatic level of detail, as loe_filter in
+            # LOEViz_base/app.py runs it; large views are collapsed
+            aggregations = {
+                level: base.aggregate.Aggregation(graph, level)
+                for level in ("objective", "loe")
+            }
+            record(
+                "loe_filter_collapsed",
+                scale,
+                size,
+                measure(
+                    lambda _: base.aggregate.detail_view(
+                        graph, graph.loe_positions(loe_ids), aggregations
+                    ),
+                    None,
+                    repeat,
+                ),
+            )
+            local_graph = local.graph.ProjectGraph(elements)
+            node_ids = [
+                element["data"]["id"]
+                for element in elements
+                if element["data"].get("parent") is not None
+            ]
+            # as node_filter in LOEViz_local/app.py runs it, with the default options
+            record(
+                "node_filter",
+                scale,
+                size,
+                measure(
+                    lambda _: local_graph.query_elements(
+                        node_ids[::10],
+                        hops=1,
+                        direction="both",
+                        classes={"dep", "interdep"},
+                    ),
+                    None,
+                    repeat,
+                ),
+            )
+
+            # status propagation from the first intermediate objective
+            record(
+                "update_downstream_elements",
+                scale,
+                size,
+                measure(
+                    lambda copied: downstream.helper.update_downstream_elements(
+                        [{"id": node_ids[0]}], copied
+                    ),
+                    lambda: copy.deepcopy(elements),
+                    repeat,
+                ),
+            )
+
+            # slip scenarios, from the elements' statuses
+            slips = downstream.scenarios.SlipScenarios(
+                downstream.graph.ProjectGraph(elements)
+            )
+            record(
+                "slip_scenarios",
+                scale,
+                size,
+                measure(lambda _: slips.run(trials=1000, seed=0), None, repeat),
+            )
+
+            # critical path schedule, shown in the timeline
+            record(
+                "critical_path",
+                scale,
+                size,
+                measure(
+                    lambda _: base.schedule.critical_path(project_data), None, repeat
+                ),
+            )
+
+            # timeline figure, and the size of the JSON sent to the browser
+            figure = base.timeline.build_timeline(project_data)
+            record(
+                "build_timeline",
+                scale,
+                size,
+                measure(
+                    lambda _: base.timeline.build_timeline(project_data), None, repeat
+                ),
+                json_bytes=len(figure.to_json()),
+            )
+
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Find benchmarks that got slower than a previous run, or that use more
+    memory where it is measured.
+
+    Args:
+        results (list[dict]): The results of this run.
+        baseline (list[dict]): The results of an earlier run.
+        tolerance (float): How many times slower (or larger) than the baseline is
+            acceptable.
+
+    Returns:
+        list[str]: A description of every regression.
+    """
+    previous = {(result["name"], result["scale"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["scale"]))
+        if before and result["median_s"] > before["median_s"] * tolerance:
+            regressions.append(
+                f"{result['name']} ({result['scale']}): "
+                f"{before['median_s'] * 1000:.2f} ms -> "
+                f"{result['median_s'] * 1000:.2f} ms"
+            )
+        if (
+            before
+            and "peak_bytes" in before
+            and result.get("peak_bytes", 0) > before["peak_bytes"] * tolerance
+        ):
+            regressions.append(
+                f"{result['name']} ({result['scale']}) memory: "
+                f"{before['peak_bytes'] / 1e6:.1f} MB -> "
+                f"{result['peak_bytes'] / 1e6:.1f} MB"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time loading, filtering, propagation and figure building "
+        "on synthetic projects, and optionally the startup of the apps.",
+    )
+    parser.add_argument(
+        "--scales",
+        default=",".join(SCALES),
+        help=f"comma-separated scales to run (default: {','.join(SCALES)})",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs each")
+    parser.add_argument(
+        "--output", default="bench_results.json", help="where to save the results"
+    )
+    parser.add_argument(
+        "--compare", help="earlier results file to check for regressions against"
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="also time each app's startup (import and first response) in fresh "
+        "processes, with a report of its slowest imports from python -X importtime",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.5,
+        help="slowdown factor that counts as a regression (default: 1.5)",
+    )
+    args = parser.parse_args(argv)
+
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)}")
+
+    results = run(scales, args.repeat)
+    if args.startup:
+        results += startup.run(args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
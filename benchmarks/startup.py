@@ -0,0 +1,141 @@
+# STARTUP TIMING
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ("LOEViz_base", "LOEViz_downstream", "LOEViz_local")
+# imports of the app module listed in the import time report
+REPORT_IMPORTS = 8
+
+# run in a fresh process in the app folder: import the app, then request the page
+# and its layout, then run the callback that fills the page in (if the app has
+# one, given as the request body in the first argument)
+FIRST_RESPONSE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.server.test_client()
+client.get("/")
+client.get("/_dash-layout")
+responded = time.perf_counter()
+timings = {"startup_import": imported - start, "startup_first_response": responded - start}
+if sys.argv[1:]:
+    client.post("/_dash-update-component", json=json.loads(sys.argv[1]))
+    timings["startup_first_page"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+# app folder -> the callback request that shows its first page
+FIRST_PAGE = {
+    "LOEViz_base": {
+        "output": "page.children",
+        "outputs": {"id": "page", "property": "children"},
+        "inputs": [{"id": "url", "property": "pathname", "value": "/"}],
+        "changedPropIds": ["url.pathname"],
+    },
+}
+
+
+def import_times(folder: str) -> list[tuple[str, float]]:
+    """Get how long the app module and each of its direct imports take to import.
+
+    Runs "python -X importtime -c 'import app'" in the app folder.
+
+    Args:
+        folder (str): The app folder to run in.
+
+    Returns:
+        list[tuple[str, float]]: ("app", seconds) first, then the modules the app
+            imports directly, slowest first, with their cumulative import times.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=folder,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | imported package", with nested imports
+    # indented two spaces per level and listed before the module importing them
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative) / 1e6))
+
+    last = max(i for i, (depth, name, _) in enumerate(entries) if name == "app")
+    children = []
+    for depth, name, seconds in reversed(entries[:last]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, seconds))
+    children.sort(key=lambda child: child[1], reverse=True)
+    return [("app", entries[last][2])] + children
+
+
+def run(repeat: int = 5) -> list[dict]:
+    """Time the startup of every app in fresh processes, and print an import time
+    report.
+
+    Each app folder is copied to a temporary directory first, since loading the
+    sample workbook may write statuses back to it.
+
+    Args:
+        repeat (int): The number of fresh processes timed per app.
+
+    Returns:
+        list[dict]: One result per measurement and app, with the app folder as the
+            scale.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for app in APPS:
+            folder = os.path.join(directory, app)
+            shutil.copytree(
+                os.path.join(ROOT, app),
+                folder,
+                ignore=shutil.ignore_patterns("__pycache__", ".loeviz_*"),
+            )
+            # the first run also writes bytecode and the workbook cache, so that
+            # the timed runs all start the same way
+            command = [sys.executable, "-c", FIRST_RESPONSE]
+            if app in FIRST_PAGE:
+                command.append(json.dumps(FIRST_PAGE[app]))
+            runs = [
+                json.loads(
+                    subprocess.run(
+                        command, cwd=folder, capture_output=True, text=True, check=True
+                    ).stdout.splitlines()[-1]
+                )
+                for _ in range(repeat + 1)
+            ][1:]
+            for name in runs[0]:
+                times = [timings[name] for timings in runs]
+                results.append(
+                    {
+                        "name": name,
+                        "scale": app,
+                        "min_s": min(times),
+                        "median_s": statistics.median(times),
+                        "repeat": repeat,
+                    }
+                )
+                print(
+                    f"{name:<28} {app:<18} median {results[-1]['median_s'] * 1000:10.2f} ms",
+                    flush=True,
+                )
+
+            report = import_times(folder)
+            print(f"  import app {report[0][1] * 1000:.0f} ms, slowest imports:")
+            for name, seconds in report[1 : REPORT_IMPORTS + 1]:
+                print(f"    {name:<24} {seconds * 1000:8.1f} ms")
+    return results